@@ -93,4 +93,42 @@ def handle_data(context):
         else:
             context.log.info("现金不足，无法下单")
     else:
-        context.log.info("无交易信号，进入下一根bar")
\ No newline at end of file
+        context.log.info("无交易信号，进入下一根bar")
+
+
+# 本地回测引擎的信号模式（python -m backtest run --mode signal）使用，托管平台会忽略：
+# 与handle_data一样对每根bar只用最近adosc_window*10根bar计算ADOSC，ADOSC>0为买入信号，ADOSC<0为卖出信号；
+# 历史数据不足adosc_window*10根bar时无信号。按talib的算法（AD从窗口第一根bar开始累加，两条EMA以窗口第一根bar的AD值为初值）
+# 把所有窗口按行分块一起计算，结果与逐根bar调用talib.ADOSC相同
+SIGNAL_ORDER_TYPE = "limit"
+
+
+def vectorized_signal(context, bars):
+    window = context.user_data.adosc_window * 10
+    fast_period = context.user_data.fast_period
+    slow_period = context.user_data.slow_period
+    high = np.asarray(bars.high, dtype=np.float64)
+    low = np.asarray(bars.low, dtype=np.float64)
+    close = np.asarray(bars.close, dtype=np.float64)
+    volume = np.asarray(bars.volume, dtype=np.float64)
+    signal = np.zeros(len(close))
+    if len(close) < window or window < max(fast_period, slow_period):
+        # 窗口比EMA周期短时talib.ADOSC全部为NaN，handle_data不会下单
+        return signal
+
+    # 每根bar对AD的贡献，最高价等于最低价时为0
+    spread = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flow = np.where(spread > 0, ((close - low) - (high - close)) / spread * volume, 0.0)
+    fast_k = 2.0 / (fast_period + 1)
+    slow_k = 2.0 / (slow_period + 1)
+    windows = np.lib.stride_tricks.sliding_window_view(flow, window)
+    chunk = 4096
+    for start in range(0, len(windows), chunk):
+        ad = np.cumsum(windows[start:start + chunk], axis=1)
+        fast = slow = ad[:, 0]
+        for column in range(1, window):
+            fast = fast_k * ad[:, column] + (1.0 - fast_k) * fast
+            slow = slow_k * ad[:, column] + (1.0 - slow_k) * slow
+        signal[window - 1 + start:window - 1 + start + len(ad)] = np.sign(np.nan_to_num(fast - slow))
+    return signal
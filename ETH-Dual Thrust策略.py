@@ -103,6 +103,7 @@ def handle_data(context):
             # 卖出时，全仓清空
             context.log.info("正在卖出 %s" % context.security)
             context.order.sell(context.security, quantity=str(context.account.huobi_cny_eth))
+        context.finished = True
         return
 
     # 获取历史数据, 取后window_size+1根bar
@@ -14,6 +14,8 @@
 # 2)在相应价格位置调整仓位至相应水平(高位减仓，低位加仓);
 # 3)在价格的波动中赚取收益。
 
+import bisect
+
 import numpy as np
 
 
@@ -56,10 +58,12 @@ def initialize(context):
     context.user_data.portfolio_stop_win = 5.0
     # 用户自定义变量，记录下是否已经触发止盈
     context.user_data.stop_win_triggered = False
-    # 设置网格的4个档位的买入价格（相对于基础价的百分比）
-    context.user_data.buy4, context.user_data.buy3, context.user_data.buy2, context.user_data.buy1 = 0.88, 0.91, 0.94, 0.97
-    # 设置网格的4个档位的卖出价格（相对于基础价的百分比）
-    context.user_data.sell4, context.user_data.sell3, context.user_data.sell2, context.user_data.sell1 = 1.8, 1.6, 1.4, 1.2
+    # 设置网格的买入档位（相对于基础价的比例，从低到高），以及价格低于各档位时的目标仓位，档位数量不限
+    context.user_data.buy_levels = [0.88, 0.91, 0.94, 0.97]
+    context.user_data.buy_target_ratios = [1, 0.9, 0.7, 0.6]
+    # 设置网格的卖出档位（相对于基础价的比例，从低到高），以及价格高于各档位时的目标仓位，档位数量不限
+    context.user_data.sell_levels = [1.2, 1.4, 1.6, 1.8]
+    context.user_data.sell_target_ratios = [0.4, 0.3, 0.1, 0]
 
 
 # 阅读3，策略核心逻辑：
@@ -106,6 +110,7 @@ def handle_data(context):
         if context.account.huobi_cny_eth >= HUOBI_CNY_ETH_MIN_ORDER_QUANTITY:
             context.log.info("正在卖出 %s" % context.security)
             context.order.sell(context.security, quantity=str(context.account.huobi_cny_eth))
+        context.finished = True
         return
 
     # 获取当前价格
@@ -138,31 +143,12 @@ def handle_data(context):
 
     cash_to_spent = 0
 
-    # 计算为达到目标仓位需要买入/卖出的金额
-    # 价格低于buy4所对应的价格时，仓位调至100%
-    if price / context.user_data.base_price < context.user_data.buy4:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 1, context.account.huobi_cny_cash)
-    # 价格大于等于buy4对应的价格，低于buy3所对应的价格时，仓位调至90%
-    elif price / context.user_data.base_price < context.user_data.buy3:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.9, context.account.huobi_cny_cash)
-    # 价格大于等于buy3对应的价格，低于buy2所对应的价格时，仓位调至70%
-    elif price / context.user_data.base_price < context.user_data.buy2:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.7, context.account.huobi_cny_cash)
-    # 价格大于等于buy2对应的价格，低于buy1所对应的价格时，仓位调至60%
-    elif price / context.user_data.base_price < context.user_data.buy1:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.6, context.account.huobi_cny_cash)
-    # 价格大于sell4对应的价格，仓位调至0%
-    elif price / context.user_data.base_price > context.user_data.sell4:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0, context.account.huobi_cny_cash)
-    # 价格小于等于sell4对应的价格，大于sell3所对应的价格时，仓位调至10%
-    elif price / context.user_data.base_price > context.user_data.sell3:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.1, context.account.huobi_cny_cash)
-    # 价格小于等于sell3对应的价格，大于sell2所对应的价格时，仓位调至30%
-    elif price / context.user_data.base_price > context.user_data.sell2:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.3, context.account.huobi_cny_cash)
-    # 价格小于等于sell2对应的价格，大于sell1所对应的价格时，仓位调至40%
-    elif price / context.user_data.base_price > context.user_data.sell1:
-        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, 0.4, context.account.huobi_cny_cash)
+    # 计算为达到目标仓位需要买入/卖出的金额，用二分查找确定价格所在的档位
+    target_ratio = grid_target_ratio(price / context.user_data.base_price, context.user_data.buy_levels,
+                                     context.user_data.buy_target_ratios, context.user_data.sell_levels,
+                                     context.user_data.sell_target_ratios)
+    if target_ratio is not None:
+        cash_to_spent = cash_to_spent_fn(context.account.huobi_cny_net, target_ratio, context.account.huobi_cny_cash)
 
     # 根据策略调整仓位
     if cash_to_spent > HUOBI_CNY_ETH_MIN_ORDER_CASH_AMOUNT:
@@ -180,4 +166,16 @@ def handle_data(context):
 
 # 计算为达到目标仓位所需要购买的金额
 def cash_to_spent_fn(net_asset, target_ratio, available_cny):
-    return available_cny - net_asset * (1 - target_ratio)
\ No newline at end of file
+    return available_cny - net_asset * (1 - target_ratio)
+
+
+# 价格/基础价为ratio时的目标仓位：ratio低于买入档位时取高于ratio的最低一档的仓位，
+# 否则高于卖出档位时取低于ratio的最高一档的仓位，都不满足时返回None（不调整仓位）
+def grid_target_ratio(ratio, buy_levels, buy_target_ratios, sell_levels, sell_target_ratios):
+    position = bisect.bisect_right(buy_levels, ratio)
+    if position < len(buy_levels):
+        return buy_target_ratios[position]
+    position = bisect.bisect_left(sell_levels, ratio)
+    if position > 0:
+        return sell_target_ratios[position - 1]
+    return None
\ No newline at end of file
@@ -90,4 +90,17 @@ def handle_data(context):
         else:
             context.log.info("现金不足，无法下单")
     else:
-        context.log.info("无交易信号，进入下一根bar")
\ No newline at end of file
+        context.log.info("无交易信号，进入下一根bar")
+
+
+# 本地回测引擎的信号模式（python -m backtest run --mode signal）使用，托管平台会忽略：
+# 在全部历史上一次性计算MOM，MOM>0为买入信号，MOM<0为卖出信号；历史数据不足mom_window+1根bar时无信号
+SIGNAL_ORDER_TYPE = "limit"
+
+
+def vectorized_signal(context, bars):
+    close = np.asarray(bars.close, dtype=np.float64)
+    mom = talib.MOM(close, timeperiod=context.user_data.mom_window)
+    signal = np.sign(np.nan_to_num(mom))
+    signal[:context.user_data.mom_window] = 0
+    return signal
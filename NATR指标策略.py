@@ -72,8 +72,8 @@ def handle_data(context):
 
     # 使用talib计算NATR
     try:
-        # 获取最新的NATR值
-        natr = talib.NATR(high, low, close, timeperiod=context.user_data.natr_period)[-1]
+        # 获取最新的NATR值，同一根日线内的各个bar使用缓存的结果
+        natr = calc_natr(context, hist.index[-1], high, low, close)
     except:
         context.log.error("计算ATR时出现错误...")
         return
@@ -109,4 +109,16 @@ def handle_data(context):
         else:
             context.log.info("现金不足，无法下单")
     else:
-        context.log.info("无交易信号，进入下一根bar")
\ No newline at end of file
+        context.log.info("无交易信号，进入下一根bar")
+
+
+# 用户自定义的函数，可以被handle_data调用：计算NATR并缓存
+# 输入是最近natr_period+1根日线，只有出现新的日线（最后一根日线的时间或收盘价变化）时才重新计算，
+# 以60m频率回测时每天只计算一次
+def calc_natr(context, last_time, high, low, close):
+    key = (context.user_data.natr_period, last_time, close[-1])
+    cache = getattr(context.user_data, "natr_cache", None)
+    if cache is None or cache[0] != key:
+        natr = talib.NATR(high, low, close, timeperiod=context.user_data.natr_period)[-1]
+        cache = context.user_data.natr_cache = (key, natr)
+    return cache[1]
@@ -88,4 +88,17 @@ def handle_data(context):
         else:
             context.log.info("现金不足，无法下单")
     else:
-        context.log.info("无交易信号，进入下一根bar")
\ No newline at end of file
+        context.log.info("无交易信号，进入下一根bar")
+
+
+# 本地回测引擎的信号模式（python -m backtest run --mode signal）使用，托管平台会忽略：
+# 在全部历史上一次性计算ROC，ROC>0为买入信号，ROC<0为卖出信号；历史数据不足roc_window+1根bar时无信号
+SIGNAL_ORDER_TYPE = "limit"
+
+
+def vectorized_signal(context, bars):
+    close = np.asarray(bars.close, dtype=np.float64)
+    roc = talib.ROC(close, timeperiod=context.user_data.roc_window)
+    signal = np.sign(np.nan_to_num(roc))
+    signal[:context.user_data.roc_window] = 0
+    return signal
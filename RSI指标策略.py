@@ -98,4 +98,26 @@ def handle_data(context):
         else:
             context.log.info("现金不足，无法下单")
     else:
-        context.log.info("无交易信号，进入下一根bar")
\ No newline at end of file
+        context.log.info("无交易信号，进入下一根bar")
+
+
+# 本地回测引擎的信号模式（python -m backtest run --mode signal）使用，托管平台会忽略：
+# 在全部历史上一次性计算RSI，RSI低于lower_rsi为买入信号，高于upper_rsi为卖出信号；历史数据不足rsi_window+1根bar时无信号。
+# handle_data每次只取rsi_window+1根bar，talib算出的RSI就是最近rsi_window个涨跌幅的平均涨幅/平均跌幅，这里用滚动求和得到同样的值
+SIGNAL_ORDER_TYPE = "market"
+
+
+def vectorized_signal(context, bars):
+    n = context.user_data.rsi_window
+    close = np.asarray(bars.close, dtype=np.float64)
+    change = np.diff(close, prepend=close[0])
+    gain = talib.SUM(np.where(change > 0, change, 0.0), timeperiod=n) / n
+    loss = talib.SUM(np.where(change < 0, -change, 0.0), timeperiod=n) / n
+    total = gain + loss
+    flat = np.abs(total) < 1e-8
+    rsi = np.where(flat, 0.0, 100.0 * gain / np.where(flat, 1.0, total))
+    signal = np.zeros(len(close))
+    signal[rsi < context.user_data.lower_rsi] = 1
+    signal[rsi > context.user_data.upper_rsi] = -1
+    signal[:n] = 0
+    return signal
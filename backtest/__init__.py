@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+# 本地回测引擎：不修改策略文件即可在本地运行 PARAMS/initialize/handle_data 形式的策略。
+#
+#     from backtest import KlineStore, run
+#     store = KlineStore("data")
+#     store.write_dataframe("huobi_cny_btc", "1d", df)
+#     store.write_dataframe("huobi_cny_btc", "1m", df_1m)   # 其余频率在用到时由1m生成并写入库中
+#     result = run("MACD指标策略.py", store)
+
+from .batch import dual_sma_sweep, ema_cross_sweep, simulate
+from .book import FillModel
+from .bus import BarBus
+from .constants import register_security
+from .data import BarSeries, MarketData, PriceMemo
+from .engine import BacktestResult, Engine, run
+from .fills import Intents, simulate_fills
+from .grid import LimitGrid
+from .store import KlineStore
+from .strategy import Strategy, load_strategy
+from .sweep import grid, random_samples, sweep
+from .trailing import TrailingBook, TrailingStops
+from .triggers import Trigger, TriggerBook
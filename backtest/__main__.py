@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# 命令行入口：
+#     python -m backtest import 数据目录 huobi_cny_btc 1m kline.csv
+#     python -m backtest resample 数据目录 huobi_cny_btc
+#     python -m backtest run 数据目录 MACD指标策略.py
+#     python -m backtest bus 数据目录 MACD指标策略.py ETH-MACD指标策略.py KDJ指标策略.py
+#     python -m backtest sweep 数据目录 MACD指标策略.py short_window=8,12,16 long_window=20,26,40
+
+import argparse
+import sys
+
+import pandas as pd
+
+from .book import FillModel
+from .bus import BarBus
+from .engine import run
+from .resample import derived_frequencies
+from .store import KlineStore
+from .sweep import grid, sweep
+
+
+def _import(args):
+    df = pd.read_csv(args.csv, index_col=0, parse_dates=True)
+    KlineStore(args.store).write_dataframe(args.security, args.frequency, df)
+
+
+def _resample(args):
+    KlineStore(args.store).resample(args.security, args.frequencies, args.utc_offset)
+
+
+def _summary(result):
+    return "bar数量: %d, 订单数量: %d, 收益率: %.2f%%" % (len(result.net), len(result.orders), result.total_return * 100)
+
+
+def _run(args):
+    result = run(args.strategy, KlineStore(args.store), log_level=args.log_level, mode=args.mode,
+                 partial_bars=args.partial_bars, resting_orders=_fill_model(args))
+    for bar_time, level, message in result.logs:
+        print("%s [%s] %s" % (pd.Timestamp(bar_time, unit="s"), level, message))
+    print(_summary(result))
+
+
+def _fill_model(args):
+    if args.resting_orders is None:
+        return None
+    return FillModel(through=args.resting_orders == "through")
+
+
+def _bus(args):
+    bus = BarBus(KlineStore(args.store), log_level=None, partial_bars=args.partial_bars,
+                 resting_orders=_fill_model(args))
+    names = []
+    for strategy in args.strategies:
+        for security in args.securities.split(",") if args.securities else [None]:
+            bus.subscribe(strategy, security=security)
+            names.append(strategy if security is None else "%s@%s" % (strategy, security))
+    for name, result in zip(names, bus.run()):
+        print("%s  %s" % (name, _summary(result)))
+
+
+def _value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _sweep(args):
+    axes = {}
+    for axis in args.axes:
+        name, values = axis.split("=", 1)
+        axes[name] = [_value(value) for value in values.split(",")]
+    table = sweep(args.strategy, KlineStore(args.store), grid(**axes), mode=args.mode, processes=args.processes)
+    print(table.sort_values("total_return", ascending=False).to_string(index=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backtest")
+    commands = parser.add_subparsers(dest="command")
+
+    parser_import = commands.add_parser("import", help="把csv格式的kline导入数据目录")
+    parser_import.add_argument("store")
+    parser_import.add_argument("security")
+    parser_import.add_argument("frequency")
+    parser_import.add_argument("csv")
+    parser_import.set_defaults(func=_import)
+
+    parser_resample = commands.add_parser("resample", help="由1m kline生成更粗的频率")
+    parser_resample.add_argument("store")
+    parser_resample.add_argument("security")
+    parser_resample.add_argument("frequencies", nargs="*", choices=derived_frequencies(), metavar="frequency")
+    parser_resample.add_argument("--utc-offset", type=int, default=0, help="bar边界所在时区相对UTC的偏移（秒）")
+    parser_resample.set_defaults(func=_resample)
+
+    parser_run = commands.add_parser("run", help="运行策略文件")
+    parser_run.add_argument("store")
+    parser_run.add_argument("strategy")
+    parser_run.add_argument("--log-level", default="warn", choices=["info", "warn", "error"])
+    parser_run.add_argument("--mode", default="bar", choices=["bar", "signal", "events"])
+    parser_run.add_argument("--partial-bars", action="store_true", help="更粗频率的kline附上正在形成的bar")
+    parser_run.add_argument("--resting-orders", choices=["touch", "through"],
+                            help="限价单挂单等待成交：最高/最低价触及或穿过限价时成交")
+    parser_run.set_defaults(func=_run)
+
+    parser_bus = commands.add_parser("bus", help="在同一条bar流上同时运行多个策略")
+    parser_bus.add_argument("store")
+    parser_bus.add_argument("strategies", nargs="+", metavar="strategy")
+    parser_bus.add_argument("--securities", help="逗号分隔的标的，每个策略对每个标的各运行一份")
+    parser_bus.add_argument("--partial-bars", action="store_true", help="更粗频率的kline附上正在形成的bar")
+    parser_bus.add_argument("--resting-orders", choices=["touch", "through"],
+                            help="限价单挂单等待成交：最高/最低价触及或穿过限价时成交")
+    parser_bus.set_defaults(func=_bus)
+
+    parser_sweep = commands.add_parser("sweep", help="对user_data参数做网格扫描")
+    parser_sweep.add_argument("store")
+    parser_sweep.add_argument("strategy")
+    parser_sweep.add_argument("axes", nargs="+", metavar="name=v1,v2,...")
+    parser_sweep.add_argument("--mode", default="bar", choices=["bar", "signal", "events"])
+    parser_sweep.add_argument("--processes", type=int, default=None)
+    parser_sweep.set_defaults(func=_sweep)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
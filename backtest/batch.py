@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# 参数轴批量回测：均线交叉类策略扫描快慢线周期时，每个周期的均线只在整段历史上算一次
+# （indicators/batch.py），所有参数组合的账户放在数组里，逐根bar对整列参数同时判断信号、模拟成交。
+# 100x100的网格只需遍历一次kline，而不是回测一万次。结果与 sweep(..., processes=1) 的汇总格式相同。
+#
+#     from backtest import KlineStore
+#     from backtest.batch import dual_sma_sweep
+#     table = dual_sma_sweep("简单双均线策略.py", KlineStore("data"),
+#                            window_short=range(2, 30), window_long=range(10, 120, 5))
+#
+# 下单方式与signals.py相同："market"用掉全部现金买入、卖出全部持仓；
+# "limit"按策略中的写法 buy_limit(quantity=现金/收盘价*0.98, price=收盘价*1.02)、sell_limit(quantity=全部持仓, price=收盘价*0.98)。
+
+import numpy as np
+import pandas as pd
+
+from .constants import CASH_UNIT, MIN_ORDER_CASH_AMOUNT, MIN_ORDER_QUANTITY, QUANTITY_UNIT, to_units
+from .engine import Engine
+from .fills import units
+from .indicators.batch import ema_matrix, sma_matrix
+from .signals import ORDER_TYPES
+from .sweep import grid
+
+
+def simulate(close, first, last, signal, cash, position, security, commission=0.0, slippage=0.0,
+             order_type="market", ready=None, stop_loss=None):
+    # cash、position是每组参数的初始现金和持仓；signal(i)返回第i根bar上每组参数的信号数组（1买入，-1卖出，0无信号）；
+    # ready[j]是第j组参数开始交易的bar，之前的bar相当于handle_data因数据不足直接返回；
+    # stop_loss与EMA指标策略相同：从上次卖出后的最高净值回撤超过stop_loss(%)时全部卖出。
+    # 余额按整数的分和聪计算，取整规则与order.py相同
+    if order_type not in ORDER_TYPES:
+        raise ValueError("不支持的下单方式: %s" % order_type)
+    cash = units(cash, CASH_UNIT)
+    position = units(position, QUANTITY_UNIT)
+    rows = len(cash)
+    min_quantity = MIN_ORDER_QUANTITY[security]
+    min_cash = MIN_ORDER_CASH_AMOUNT[security]
+    orders = np.zeros(rows, dtype=np.int64)
+    max_net = np.full(rows, np.nan)
+    peak = np.full(rows, -np.inf)
+    drawdown = np.zeros(rows)
+
+    def net_value(price):
+        return cash / float(CASH_UNIT) + position / float(QUANTITY_UNIT) * price
+
+    initial = net_value(close[first]) if first < last else cash / float(CASH_UNIT)
+    for i in range(first, last):
+        price = close[i]
+        side = np.asarray(signal(i))
+        active = None if ready is None else i >= ready
+        if active is not None:
+            side = np.where(active, side, 0)
+        if stop_loss is not None:
+            net = net_value(price)
+            max_net = np.fmax(max_net, net)
+            stopped = (1 - net / max_net) * 100 > stop_loss
+            if active is not None:
+                stopped &= active
+            side = np.where(stopped, -1, side)
+
+        sell = (side < 0) & (position / float(QUANTITY_UNIT) >= min_quantity)
+        if stop_loss is not None:
+            max_net[sell] = np.nan
+        if sell.any():
+            fill_price = to_units(price * (1 - slippage), CASH_UNIT)
+            if order_type == "limit" and to_units(price * 0.98, CASH_UNIT) > fill_price:
+                # 限价卖单价格高于市价，未成交
+                sell[:] = False
+            quantity = position[sell]
+            proceeds = quantity * fill_price // QUANTITY_UNIT
+            cash[sell] += proceeds - units(proceeds * commission, 1)
+            position[sell] -= quantity
+            orders += sell
+
+        buy = (side > 0) & (cash / float(CASH_UNIT) >= min_cash)
+        if buy.any():
+            fill_price = to_units(price * (1 + slippage), CASH_UNIT)
+            if order_type == "market":
+                cost = cash[buy]
+                quantity = cost * QUANTITY_UNIT // fill_price
+            else:
+                quantity = units(cash[buy] / float(CASH_UNIT) / price * 0.98, QUANTITY_UNIT)
+                cost = -(-quantity * fill_price // QUANTITY_UNIT)
+                filled = (quantity / float(QUANTITY_UNIT) >= min_quantity) & (cost <= cash[buy])
+                if to_units(price * 1.02, CASH_UNIT) < fill_price:
+                    # 限价买单价格低于市价，未成交
+                    filled[:] = False
+                buy[buy] = filled
+                quantity, cost = quantity[filled], cost[filled]
+            cash[buy] -= cost
+            position[buy] += quantity - units(quantity * commission, 1)
+            orders += buy
+
+        net = net_value(price)
+        peak = np.maximum(peak, net)
+        drawdown = np.maximum(drawdown, 1 - net / peak)
+
+    final = net_value(close[last - 1]) if first < last else initial
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_return = np.where(initial == 0, 0.0, final / initial - 1)
+    return {"total_return": total_return, "max_drawdown": drawdown, "orders": orders}
+
+
+def _setup(strategy, feed, params):
+    strategy, context, clock, first, last = Engine(feed, log_level=None)._prepare(strategy, params)
+    return context, clock, first, last
+
+
+def _summary(samples, results):
+    table = pd.DataFrame(samples)
+    for name in ("total_return", "max_drawdown", "orders"):
+        table[name] = results[name]
+    return table
+
+
+def _simulate(context, clock, first, last, signal, order_type, ready, stop_loss=None):
+    security = context.security
+    order = context.order
+    cash = np.full(len(ready), context.account.huobi_cny_cash)
+    position = np.full(len(ready), getattr(context.account, security))
+    return simulate(clock.close, first, last, signal, cash, position, security,
+                    order._commission, order._slippage, order_type, ready, stop_loss)
+
+
+def dual_sma_sweep(strategy, feed, window_short, window_long, params=None, order_type="limit"):
+    # 简单双均线策略：短期均线高于长期均线*(1+enter_threshold)时买入，低于长期均线*(1-exit_threshold)时卖出
+    context, clock, first, last = _setup(strategy, feed, params)
+    samples = grid(window_short=list(window_short), window_long=list(window_long))
+    long_windows = np.array([sample["window_long"] for sample in samples], dtype=np.int64)
+    # 策略只取window_long根bar，短期窗口比它长时实际上是对这window_long根bar求平均
+    short_windows = np.minimum([sample["window_short"] for sample in samples], long_windows)
+    # 长短周期放在同一个矩阵里，周期相同时两条均线完全相等，不会因舍入误差产生信号
+    periods, rows = np.unique(np.concatenate((short_windows, long_windows)), return_inverse=True)
+    short_rows, long_rows = rows[:len(samples)], rows[len(samples):]
+    # 转成 (bar数, 周期数) 的布局，每根bar取一行
+    means = np.ascontiguousarray(sma_matrix(clock.close[:last], periods).T)
+    enter = context.user_data.enter_threshold
+    exit = context.user_data.exit_threshold
+
+    def signal(i):
+        row = means[i]
+        short_mean = row[short_rows]
+        long_mean = row[long_rows]
+        side = np.where(short_mean > long_mean + enter * long_mean, 1, 0)
+        side[(side == 0) & (short_mean < long_mean - exit * long_mean)] = -1
+        return side
+
+    results = _simulate(context, clock, first, last, signal, order_type, long_windows - 1)
+    return _summary(samples, results)
+
+
+def _window_ema(close, periods):
+    # 返回全历史EMA（bar数, 周期数）、每个周期的平滑系数d，以及初值修正量 SMA - EMA。
+    # talib在最近W根bar上重新计算的EMA与全历史EMA只差初值：以s为初值位置（窗口内第period根bar），
+    #     EMA_W[i] = EMA[i] + d^(i-s) * (SMA[s] - EMA[s])
+    ema = np.ascontiguousarray(ema_matrix(close, periods).T)
+    correction = np.ascontiguousarray(sma_matrix(close, periods).T) - ema
+    for column, period in enumerate(periods.tolist()):
+        if period <= len(close):
+            # 全历史的初值就是前period根bar的平均，不需要修正
+            correction[period - 1, column] = 0.0
+    return ema, 1.0 - 2.0 / (periods + 1.0), correction
+
+
+def ema_cross_sweep(strategy, feed, ema_fast_window, ema_slow_window, params=None, order_type="market"):
+    # EMA指标策略：每根bar在最近ema_slow_window+1根bar上用talib计算快慢EMA，
+    # 快线上穿慢线买入、下穿卖出，净值从高点回撤超过stop_loss_line(%)时止损
+    context, clock, first, last = _setup(strategy, feed, params)
+    samples = grid(ema_fast_window=list(ema_fast_window), ema_slow_window=list(ema_slow_window))
+    fast_windows = np.array([sample["ema_fast_window"] for sample in samples], dtype=np.int64)
+    slow_windows = np.array([sample["ema_slow_window"] for sample in samples], dtype=np.int64)
+    windows = slow_windows + 1
+    periods, rows = np.unique(np.concatenate((fast_windows, slow_windows)), return_inverse=True)
+    ema, decay, correction = _window_ema(clock.close[:last], periods)
+    lines = [(fast_windows, rows[:len(samples)]), (slow_windows, rows[len(samples):])]
+
+    def values(i, periods, rows):
+        # 当前bar和上一根bar在同一个窗口内的EMA值（即talib结果的[-1]和[-2]），窗口不足时为NaN
+        seed = np.minimum(np.maximum(i - windows + periods, periods - 1), i)
+        offset = correction[seed, rows]
+        current = ema[i][rows] + decay[rows] ** (i - seed) * offset
+        current[(windows < periods) | (i < periods - 1)] = np.nan
+        if i == 0:
+            return current, np.full(len(rows), np.nan)
+        previous = ema[i - 1][rows] + decay[rows] ** np.maximum(i - 1 - seed, 0) * offset
+        previous[(windows < periods + 1) | (i < periods)] = np.nan
+        return current, previous
+
+    def signal(i):
+        fast, pre_fast = values(i, *lines[0])
+        slow, pre_slow = values(i, *lines[1])
+        side = np.where((pre_fast <= pre_slow) & (fast > slow), 1, 0)
+        side[(side == 0) & (pre_fast >= pre_slow) & (fast < slow)] = -1
+        return side
+
+    results = _simulate(context, clock, first, last, signal, order_type, slow_windows - 1,
+                        context.user_data.stop_loss_line)
+    return _summary(samples, results)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+# 挂单簿：开启后，下单时不能立即成交的限价单不再直接撤销，而是挂在该标的的挂单簿中，
+# 从下一根bar开始用每根bar的最高价/最低价撮合，直到成交或被策略撤销。
+# 买单按价格从高到低、卖单按价格从低到高各放在一个堆里（同价按下单顺序），
+# 下单O(log n)，撤单只做标记、轮到堆顶时再丢弃，每根bar只访问会成交的挂单，挂单再多也不需要逐个扫描。
+# 挂单期间买单冻结 数量*限价 的现金，卖单冻结下单数量的币，冻结部分计入净值但不能再用于下单。
+#
+#     from backtest import FillModel, run
+#     result = run("计划委托下单.py", store, resting_orders=FillModel(through=True))
+
+import heapq
+
+import numpy as np
+
+from .constants import CASH_UNIT, to_units
+
+FILL_PRICES = ("limit", "open")
+
+
+class FillModel(object):
+    # 挂单的成交假设：
+    #     through  为真时价格必须穿过限价（买单最低价低于限价、卖单最高价高于限价）才成交，否则触及即成交
+    #     price    "limit"按限价成交；"open"在开盘价（加减滑点）已经优于限价时按开盘价成交
+    __slots__ = ("through", "price")
+
+    def __init__(self, through=False, price="limit"):
+        if price not in FILL_PRICES:
+            raise ValueError("不支持的挂单成交价: %s" % price)
+        self.through = through
+        self.price = price
+
+
+class _Resting(object):
+    __slots__ = ("record", "quantity", "price", "reserved")
+
+    def __init__(self, record, quantity, price, reserved):
+        # quantity（聪）、price（分）为下单数量和限价，reserved为冻结的现金（分）或币（聪）
+        self.record = record
+        self.quantity = quantity
+        self.price = price
+        self.reserved = reserved
+
+
+class OrderBook(object):
+    # 一个标的的挂单；position是已经撮合过的bar数量（该标的在回测频率下的kline）
+    __slots__ = ("_bids", "_asks", "live", "position")
+
+    def __init__(self):
+        self._bids = []
+        self._asks = []
+        self.live = {}
+        self.position = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def add(self, resting):
+        record = resting.record
+        key = -resting.price if record.side == "buy" else resting.price
+        heapq.heappush(self._bids if record.side == "buy" else self._asks, (key, record.id, resting))
+        self.live[record.id] = resting
+
+    def cancel(self, id):
+        # 返回被撤销的挂单，不在挂单簿中时返回None
+        resting = self.live.pop(id, None)
+        if len(self._bids) + len(self._asks) > 2 * len(self.live) + 64:
+            # 已撤销的挂单太多时重建两个堆
+            self._bids = [entry for entry in self._bids if entry[1] in self.live]
+            self._asks = [entry for entry in self._asks if entry[1] in self.live]
+            heapq.heapify(self._bids)
+            heapq.heapify(self._asks)
+        return resting
+
+    def _pop(self, heap, crossed):
+        # 依次取出堆顶满足crossed(限价)的挂单，跳过已撤销的
+        while heap:
+            key, id, resting = heap[0]
+            if id not in self.live:
+                heapq.heappop(heap)
+                continue
+            if not crossed(resting.price):
+                return
+            heapq.heappop(heap)
+            del self.live[id]
+            yield resting
+
+    def match(self, open, high, low, model, slippage):
+        # 用一根bar的开盘价、最高价、最低价（元）撮合，返回 [(挂单, 成交价（分）)]，先买单后卖单
+        fills = []
+        high = to_units(high, CASH_UNIT)
+        low = to_units(low, CASH_UNIT)
+        if model.through:
+            bids = self._pop(self._bids, lambda price: low < price)
+            asks = self._pop(self._asks, lambda price: high > price)
+        else:
+            bids = self._pop(self._bids, lambda price: low <= price)
+            asks = self._pop(self._asks, lambda price: high >= price)
+        buy_open = to_units(open * (1 + slippage), CASH_UNIT)
+        sell_open = to_units(open * (1 - slippage), CASH_UNIT)
+        for resting in bids:
+            price = resting.price
+            if model.price == "open":
+                price = min(price, buy_open)
+            fills.append((resting, price))
+        for resting in asks:
+            price = resting.price
+            if model.price == "open":
+                price = max(price, sell_open)
+            fills.append((resting, price))
+        return fills
+
+    def _top(self, heap):
+        # 堆顶的有效挂单，丢弃已撤销的；没有时返回None
+        while heap:
+            key, id, resting = heap[0]
+            if id in self.live:
+                return resting
+            heapq.heappop(heap)
+        return None
+
+    def best_bid(self):
+        # 最高的买单限价（分），没有买单时返回None
+        resting = self._top(self._bids)
+        return None if resting is None else resting.price
+
+    def best_ask(self):
+        # 最低的卖单限价（分），没有卖单时返回None
+        resting = self._top(self._asks)
+        return None if resting is None else resting.price
+
+    def orders(self):
+        return [self.live[id].record for id in sorted(self.live)]
+
+
+def next_touch(low, high, start, bid, ask, through=False, end=None):
+    # low/high为kline最低价、最高价的数组，bid/ask为最高买单和最低卖单的限价（与数组同单位，没有时为None）。
+    # 返回[start, end)中第一根能让挂单成交的bar（最低价触及bid或最高价触及ask，through为真时必须穿过），
+    # 没有则返回end（默认len(low)）。分块向后查找，块长每次翻倍，
+    # 成交很近时只看几十根bar，很远时总的比较次数也与跳过的bar数成正比
+    size = len(low) if end is None else end
+    block = 64
+    while start < size:
+        stop = min(start + block, size)
+        lows, highs = low[start:stop], high[start:stop]
+        hit = np.zeros(stop - start, dtype=bool)
+        if bid is not None:
+            hit |= lows < bid if through else lows <= bid
+        if ask is not None:
+            hit |= highs > ask if through else highs >= ask
+        found = np.flatnonzero(hit)
+        if len(found):
+            return start + int(found[0])
+        start = stop
+        block *= 2
+    return size
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# bar事件总线：多个策略共用一份行情数据和一个时钟同时回测。每个策略仍有自己的PARAMS、
+# 回测频率和独立的context/账户；总线把所有策略的bar按收盘时间合并成一条事件流，
+# 同一时刻收盘的bar先分发频率细的（这一分钟的1m bar先于同时走完的日线），同频率按订阅顺序。
+# 所有策略共用一个get_price缓存，同一时刻相同的窗口只构造一次。
+#
+#     from backtest import KlineStore
+#     from backtest.bus import BarBus
+#     bus = BarBus(KlineStore("data"))
+#     for path in ["MACD指标策略.py", "ETH-MACD指标策略.py", "KDJ指标策略.py"]:
+#         bus.subscribe(path)
+#     results = bus.run()
+
+import numpy as np
+
+from .data import PriceMemo
+from .engine import BacktestResult, Engine, _asleep, _awake, _equity
+
+
+class _Subscription(object):
+    __slots__ = ("strategy", "context", "clock", "first", "last")
+
+    def __init__(self, strategy, context, clock, first, last):
+        self.strategy = strategy
+        self.context = context
+        self.clock = clock
+        self.first = first
+        self.last = last
+
+
+class BarBus(object):
+    def __init__(self, feed, log_level="warn", partial_bars=False, resting_orders=None):
+        self.memo = PriceMemo()
+        self._engine = Engine(feed, log_level, partial_bars, self.memo, resting_orders)
+        self._subscriptions = []
+
+    def subscribe(self, strategy, params=None, user_data=None, security=None):
+        # 加载策略并执行initialize；同一个策略文件可以用不同的参数或标的（见engine._retarget）订阅多次，
+        # 各自有独立的模块全局变量
+        subscription = _Subscription(*self._engine._prepare(strategy, params, user_data, security))
+        self._subscriptions.append(subscription)
+        return len(self._subscriptions) - 1
+
+    def _events(self):
+        # 合并所有策略的bar：按(收盘时间, bar时长, 订阅顺序)排序，返回订阅序号和bar位置
+        times, periods, owners, bars = [], [], [], []
+        for number, subscription in enumerate(self._subscriptions):
+            clock = subscription.clock
+            positions = np.arange(subscription.first, subscription.last)
+            times.append(clock.close_time[subscription.first:subscription.last])
+            periods.append(np.full(len(positions), clock.period))
+            owners.append(np.full(len(positions), number))
+            bars.append(positions)
+        if not times:
+            return [], []
+        times, periods, owners, bars = [np.concatenate(arrays) for arrays in (times, periods, owners, bars)]
+        order = np.lexsort((owners, periods, times))
+        return owners[order].tolist(), bars[order].tolist()
+
+    def run(self):
+        # 按时间顺序把每根bar分发给对应策略的handle_data，返回每个策略的BacktestResult（按订阅顺序）
+        subscriptions = self._subscriptions
+        steps = [(subscription.context.data, subscription.context.account,
+                  subscription.context.account._track(subscription.context.security), subscription.clock.close,
+                  subscription.clock.time, subscription.strategy.handle_data, subscription.strategy.handle_order,
+                  subscription.context)
+                 for subscription in subscriptions]
+        owners, bars = self._events()
+        for owner, i in zip(owners, bars):
+            data, account, tracked, close, time, handle_data, handle_order, context = steps[owner]
+            data._advance(i)
+            account._mark(tracked, close[i])
+            if account._held:
+                account._mark_held(data)
+            if context.order._books:
+                filled = context.order._match()
+                if filled and handle_order is not None:
+                    for record in filled:
+                        handle_order(context, record)
+            if context.order._triggers or context.order._trailing:
+                context.order._trigger()
+            # 声明结束或暂停的策略不调用handle_data，见Context
+            if not _asleep(context) or _awake(context, time[i], close[i]):
+                handle_data(context)
+
+        results = []
+        for subscription in subscriptions:
+            clock, first, last = subscription.clock, subscription.first, subscription.last
+            results.append(BacktestResult(subscription.strategy, subscription.context, clock.close_time[first:last],
+                                          _equity(subscription.context, clock, first, last),
+                                          subscription.context.log.records))
+        return results
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# 本地回测引擎使用的常量：bar频率、交易所最小下单量等。
+
+# 支持的回测频率及其对应的bar时长（秒）
+FREQUENCIES = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "60m": 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+    "1w": 7 * 24 * 60 * 60,
+}
+
+# kline字段，顺序即为get_price返回的列顺序
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# 支持的标的
+SECURITIES = ("huobi_cny_btc", "huobi_cny_ltc", "huobi_cny_eth")
+
+# 交易所最小下单数量（币）
+MIN_ORDER_QUANTITY = {
+    "huobi_cny_btc": 0.001,
+    "huobi_cny_ltc": 0.01,
+    "huobi_cny_eth": 0.01,
+}
+
+# 交易所最小下单金额（元）
+MIN_ORDER_CASH_AMOUNT = {
+    "huobi_cny_btc": 1.0,
+    "huobi_cny_ltc": 1.0,
+    "huobi_cny_eth": 1.0,
+}
+
+# 账户余额和订单使用的最小单位：现金和价格以分计，币的数量以聪(1e-8)计，都保存为整数。
+# 策略传入的数量、金额和价格（数字或字符串）在下单时换算成最小单位一次，之后的撮合、手续费和余额都是整数运算
+CASH_UNIT = 100
+QUANTITY_UNIT = 10 ** 8
+
+
+def to_units(value, unit):
+    # 四舍五入到最小单位：to_units("0.1234", QUANTITY_UNIT) -> 12340000
+    return int(round(float(value) * unit))
+
+
+def register_security(security, min_order_quantity, min_order_cash_amount):
+    # 添加新的交易对，例如 register_security("huobi_cny_etc", 0.01, 1.0)，之后账户、下单和策略全局常量都支持它
+    MIN_ORDER_QUANTITY[security] = float(min_order_quantity)
+    MIN_ORDER_CASH_AMOUNT[security] = float(min_order_cash_amount)
+
+
+def securities():
+    # 全部可交易的标的：内置的三个交易对加上register_security添加的
+    return tuple(MIN_ORDER_QUANTITY)
+
+
+def min_order_names(security):
+    # 策略全局常量名，如 ("HUOBI_CNY_BTC_MIN_ORDER_QUANTITY", "HUOBI_CNY_BTC_MIN_ORDER_CASH_AMOUNT")
+    prefix = security.upper()
+    return prefix + "_MIN_ORDER_QUANTITY", prefix + "_MIN_ORDER_CASH_AMOUNT"
+
+
+def strategy_globals():
+    # 托管平台注入到策略文件中的全局常量，如 HUOBI_CNY_BTC_MIN_ORDER_QUANTITY
+    names = {}
+    for security in securities():
+        quantity, cash_amount = min_order_names(security)
+        names[quantity] = MIN_ORDER_QUANTITY[security]
+        names[cash_amount] = MIN_ORDER_CASH_AMOUNT[security]
+    return names
+
+
+def currency_of(security):
+    # "huobi_cny_btc" -> "btc"
+    return security.rsplit("_", 1)[-1]
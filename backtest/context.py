@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+# 策略中的 context 对象：context.user_data、context.log、context.account、context.account_initial。
+# context.data 见 data.py，context.order 见 order.py，context.indicators 见 indicators/。
+
+from array import array
+from operator import mul
+
+from .constants import CASH_UNIT, QUANTITY_UNIT, securities, to_units
+from .indicators import Indicators
+from .ledger import CASH, Ledger
+
+LEVELS = {"info": 0, "warn": 1, "error": 2}
+
+
+class UserData(object):
+    # 用户自定义变量，initialize中随意赋值
+    pass
+
+
+class Context(object):
+    def __init__(self, data, order, account, log):
+        self.frequency = None
+        self.benchmark = None
+        self.security = None
+        self.user_data = UserData()
+        self.data = data
+        self.order = order
+        self.account = account
+        self.account_initial = None
+        self.log = log
+        self.indicators = Indicators(data)
+        # 策略在handle_data中设置以下属性，声明接下来的bar上不会有任何操作，本地引擎据此跳过空转的bar（见engine._resume）。
+        # 托管平台忽略这些属性、照常逐bar调用handle_data，所以只能在handle_data确实什么都不做时设置：
+        #     finished    为真时之后不再调用handle_data
+        #     idle_until  暂停到开盘时间达到该时间（时间字符串或秒）的bar
+        #     wake_above  暂停到收盘价不低于该价格的bar
+        #     wake_below  暂停到收盘价不高于该价格的bar
+        # 同时设置了多个唤醒条件时任一条件满足即醒来，醒来时清除所有唤醒条件
+        self.finished = False
+        self.idle_until = None
+        self.wake_above = None
+        self.wake_below = None
+
+
+def _ignore(message, *args):
+    pass
+
+
+class Log(object):
+    # 策略中的 context.log；低于level的日志直接丢弃，level为None时不记录任何日志。
+    # 策略每根bar会打印大量info日志，不记录时的调用开销要尽量小
+    def __init__(self, data, level="warn"):
+        self.records = []
+        self._data = data
+        threshold = len(LEVELS) if level is None else LEVELS[level]
+        for name, value in LEVELS.items():
+            setattr(self, name, self._writer(name) if value >= threshold else _ignore)
+
+    def _writer(self, level):
+        records = self.records
+        data = self._data
+
+        def write(message, *args):
+            if args:
+                message = message % args
+            records.append((data._now, level, message))
+        return write
+
+
+def _balance(name):
+    def get(self):
+        return self._available[self._index[name]]
+
+    def set(self, value):
+        self._set(self._index[name], to_units(value, QUANTITY_UNIT))
+    return property(get, set)
+
+
+_account_classes = {}
+
+
+def _account_class(names):
+    # 每组标的名称生成一个Account子类，每个名称是一个读写余额数组的属性
+    cls = _account_classes.get(names)
+    if cls is None:
+        attributes = dict((name, _balance(name)) for name in names)
+        attributes["__slots__"] = ()
+        attributes["_names"] = names
+        cls = _account_classes[names] = type("Account", (Account,), attributes)
+    return cls
+
+
+class Account(object):
+    # 策略中的 context.account，属性名与标的名称一致，如 huobi_cny_btc。
+    # 各币种的余额（整数，单位见constants.QUANTITY_UNIT）和标记价格保存在定长数组中，读取时换算成币；
+    # 现金以分为单位保存。huobi_cny_net = 现金 + Σ 余额 * 价格，
+    # 只在余额或价格变化后第一次读取时重新计算。每次余额变化都追加到ledger（见ledger.py），
+    # 回测结束后由它得到净值曲线。挂单冻结的现金和币（见book.py）计入净值，但不计入可用余额，
+    # 余额属性和huobi_cny_cash都是可用余额。标的可以是register_security添加的任意交易对，
+    # Account(initial, data)返回的是包含这些标的属性的子类实例
+    __slots__ = ("ledger", "_data", "_cash", "_cash_units", "_frozen_cash", "_available_cash", "_index",
+                 "_units", "_balances", "_frozen", "_available", "_prices", "_net", "_stale", "_tracked", "_held")
+    _names = ()
+
+    def __new__(cls, initial, data):
+        if cls is Account:
+            known = securities()
+            extra = sorted(name for name in initial if name not in known and name != "huobi_cny_cash")
+            cls = _account_class(known + tuple(extra))
+        return object.__new__(cls)
+
+    def __init__(self, initial, data):
+        # data提供记录流水用的当前时间
+        names = self._names
+        self.ledger = Ledger()
+        self._data = data
+        self._index = dict((name, index) for index, name in enumerate(names))
+        self._units = array("q", [0] * len(names))
+        self._balances = array("d", [0.0] * len(names))
+        self._frozen = array("q", [0] * len(names))
+        self._available = array("d", [0.0] * len(names))
+        self._frozen_cash = 0
+        self._prices = array("d", [0.0] * len(names))
+        self._net = 0.0
+        self._stale = True
+        # _tracked：回测标的，每根bar都会标记价格；_held：其余有持仓、需要另外标记价格的币种
+        self._tracked = -1
+        self._held = set()
+        self.huobi_cny_cash = initial.get("huobi_cny_cash", 0)
+        for name in names:
+            setattr(self, name, initial.get(name, 0))
+
+    @property
+    def huobi_cny_cash(self):
+        return self._available_cash
+
+    @huobi_cny_cash.setter
+    def huobi_cny_cash(self, value):
+        self._set_cash(to_units(value, CASH_UNIT))
+
+    def _set_cash(self, units):
+        # 设置现金总额（分，含冻结部分）
+        self._cash_units = units
+        self._cash = units / float(CASH_UNIT)
+        self._available_cash = (units - self._frozen_cash) / float(CASH_UNIT)
+        self._stale = True
+        self.ledger.append(self._data._now, CASH, self._cash)
+
+    def _set(self, index, units):
+        # 设置index处币种的余额（最小单位，含冻结部分）
+        self._units[index] = units
+        balance = self._balances[index] = units / float(QUANTITY_UNIT)
+        self._available[index] = (units - self._frozen[index]) / float(QUANTITY_UNIT)
+        self._stale = True
+        self.ledger.append(self._data._now, index, balance)
+        if units and index != self._tracked:
+            self._held.add(index)
+        else:
+            self._held.discard(index)
+
+    def _free_cash(self):
+        return self._cash_units - self._frozen_cash
+
+    def _free(self, index):
+        return self._units[index] - self._frozen[index]
+
+    def _freeze_cash(self, units):
+        # 冻结（units为负时解冻）现金，总额和净值不变
+        self._frozen_cash += units
+        self._available_cash = (self._cash_units - self._frozen_cash) / float(CASH_UNIT)
+
+    def _freeze(self, index, units):
+        self._frozen[index] += units
+        self._available[index] = (self._units[index] - self._frozen[index]) / float(QUANTITY_UNIT)
+
+    def names(self):
+        # 全部余额属性名，包括_alias设置的别名
+        return list(self._index)
+
+    def _alias(self, name, target):
+        # 让name指向target的余额，用于把为一个币种写的策略用在另一个币种上；name原有的余额并入target
+        index = self._index[name]
+        units = self._units[index]
+        self._set(index, 0)
+        self._index[name] = self._index[target]
+        if units:
+            self._set(self._index[target], self._units[self._index[target]] + units)
+
+    def _track(self, security):
+        self._tracked = self._index[security]
+        self._held.discard(self._tracked)
+        return self._tracked
+
+    def _mark(self, index, price):
+        if self._prices[index] != price:
+            self._prices[index] = price
+            self._stale = True
+
+    def _mark_held(self, data):
+        # 回测标的以外的持仓按各自最近走完的bar的收盘价标记
+        for index in list(self._held):
+            price = data._latest_price(self._names[index])
+            if price is not None:
+                self._mark(index, price)
+
+    @property
+    def huobi_cny_net(self):
+        if self._stale:
+            self._net = self._cash + sum(map(mul, self._balances, self._prices))
+            self._stale = False
+        return self._net
+
+    def snapshot(self):
+        return AccountInitial(self)
+
+
+class AccountInitial(object):
+    # 策略中的 context.account_initial，回测开始时账户状态的快照
+    def __init__(self, account):
+        self.huobi_cny_cash = account.huobi_cny_cash
+        for name in account.names():
+            setattr(self, name, getattr(account, name))
+        self.huobi_cny_net = account.huobi_cny_net
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# 行情数据：每个(标的, 频率)一组连续的numpy数组，以及策略中 context.data 对应的取数接口。
+
+import numpy as np
+import pandas as pd
+
+from .constants import FIELDS, FREQUENCIES
+from .frame import HistoryFrame
+from .resample import PARTIAL_COLUMNS, SOURCE, PartialBars, derived_frequencies, resample
+
+
+def _readonly(values, dtype):
+    # 只读视图：get_price返回的窗口会被多个调用方共享，不能被其中一个修改；调用方传入的数组本身不受影响
+    view = np.ascontiguousarray(values, dtype=dtype).view()
+    view.flags.writeable = False
+    return view
+
+
+class BarSeries(object):
+    # 一个标的在一个频率下的全部kline，time为bar开始时间（秒），close_time为bar结束时间
+    __slots__ = ("security", "frequency", "period", "time", "close_time",
+                 "open", "high", "low", "close", "volume")
+
+    def __init__(self, security, frequency, time, open, high, low, close, volume):
+        if frequency not in FREQUENCIES:
+            raise ValueError("不支持的频率: %s" % frequency)
+        self.security = security
+        self.frequency = frequency
+        self.period = FREQUENCIES[frequency]
+        self.time = _readonly(time, np.int64)
+        self.close_time = _readonly(self.time + self.period, np.int64)
+        self.open = _readonly(open, np.float64)
+        self.high = _readonly(high, np.float64)
+        self.low = _readonly(low, np.float64)
+        self.close = _readonly(close, np.float64)
+        self.volume = _readonly(volume, np.float64)
+
+    def __len__(self):
+        return len(self.time)
+
+    def completed(self, now):
+        # 截止到now（含）已经走完的bar数量
+        return int(np.searchsorted(self.close_time, now, "right"))
+
+
+class MarketData(object):
+    # 内存中的行情数据集合，回测引擎从这里取数
+    def __init__(self):
+        self._series = {}
+        self._partials = {}
+
+    def add(self, security, frequency, time, open, high, low, close, volume):
+        series = BarSeries(security, frequency, time, open, high, low, close, volume)
+        self._series[(security, frequency)] = series
+        # 直接添加的数据不再对应之前由1m生成的部分bar
+        for key in list(self._partials):
+            if key == (security, frequency) or (frequency == SOURCE and key[0] == security):
+                del self._partials[key]
+        return series
+
+    def resample(self, security, frequencies=None, utc_offset=0):
+        # 由1m数据生成更粗的频率（默认全部），同时保存每根1m bar上正在形成的bar，见resample.py
+        minute = self.series(security, SOURCE)
+        for frequency in frequencies or derived_frequencies():
+            bars, partial = resample(minute, frequency, utc_offset)
+            series = self.add(security, frequency, *bars)
+            self._partials[(security, frequency)] = PartialBars(
+                series, minute, *(partial[column] for column in PARTIAL_COLUMNS))
+
+    def partial(self, security, frequency):
+        # 由1m生成的序列返回PartialBars，其余返回None
+        return self._partials.get((security, frequency))
+
+    def add_dataframe(self, security, frequency, df):
+        # df的索引（或"time"列）为bar开始时间，列包含 open/high/low/close/volume
+        if "time" in df.columns:
+            index = pd.DatetimeIndex(df["time"])
+        else:
+            index = pd.DatetimeIndex(df.index)
+        time = index.values.astype("datetime64[s]").astype(np.int64)
+        return self.add(security, frequency, time, *(df[field].values for field in FIELDS))
+
+    def series(self, security, frequency):
+        try:
+            return self._series[(security, frequency)]
+        except KeyError:
+            raise KeyError("没有 %s 的 %s 行情数据" % (security, frequency))
+
+    def __contains__(self, key):
+        return key in self._series
+
+
+class PriceMemo(object):
+    # 以bar为作用域的get_price缓存：同一时刻相同(标的, 数量, 频率)的请求得到同一个只读窗口，
+    # 时刻变化时整体清空。多个策略在同一条bar流上运行时可以共用一个PriceMemo，
+    # hits/misses为累计的命中和未命中次数
+    __slots__ = ("now", "windows", "hits", "misses")
+
+    def __init__(self):
+        self.now = None
+        self.windows = {}
+        self.hits = 0
+        self.misses = 0
+
+
+class Data(object):
+    # 策略中的 context.data
+    __slots__ = ("_feed", "_clock", "_index", "_now", "_ends", "_partial_bars", "memo")
+
+    def __init__(self, feed, partial_bars=False, memo=None):
+        # partial_bars为真时，取比回测频率更粗的kline会在末尾附上当前正在形成的bar（需要由1m生成的数据）
+        self._feed = feed
+        self._partial_bars = partial_bars
+        self.memo = PriceMemo() if memo is None else memo
+        self._clock = None
+        self._index = -1
+        self._now = 0
+        self._ends = {}
+
+    def _bind(self, clock):
+        self._clock = clock
+
+    def _advance(self, index):
+        self._index = index
+        self._now = self._clock.close_time[index]
+
+    def _end(self, series):
+        # 当前时刻可见的bar数量；与回测频率相同的标的直接使用游标，其余按时间二分查找并缓存
+        if series is self._clock:
+            return self._index + 1
+        cached = self._ends.get(series)
+        if cached is not None and cached[0] == self._now:
+            return cached[1]
+        end = series.completed(self._now)
+        self._ends[series] = (self._now, end)
+        return end
+
+    def _version(self, series):
+        # get_price在该序列上的结果只在这个值变化时才会变化：新走完的bar，或者正在形成的bar有了新数据
+        end = self._end(series)
+        if self._partial_bars and series.period > self._clock.period:
+            partial = self._feed.partial(series.security, series.frequency)
+            if partial is not None and partial.at(self._now) is not None:
+                return end, self._now
+        return end
+
+    def get_price(self, security, count=None, frequency=None):
+        frequency = frequency or self._clock.frequency
+        partial_bars = self._partial_bars and FREQUENCIES.get(frequency, 0) > self._clock.period
+        memo = self.memo
+        if memo.now != self._now:
+            memo.now = self._now
+            memo.windows = {}
+        key = (security, count, frequency, partial_bars)
+        window = memo.windows.get(key)
+        if window is not None:
+            memo.hits += 1
+            return window
+        memo.misses += 1
+        window = memo.windows[key] = self._window(security, count, frequency, partial_bars)
+        return window
+
+    def _window(self, security, count, frequency, partial_bars):
+        series = self._feed.series(security, frequency)
+        end = self._end(series)
+        if partial_bars and (count is None or count >= 1):
+            partial = self._feed.partial(security, frequency)
+            current = None if partial is None else partial.at(self._now)
+            if current is not None:
+                return self._with_current(series, partial, current, count)
+        start = 0 if count is None else max(0, end - int(count))
+        return HistoryFrame(series, start, end)
+
+    def _with_current(self, series, partial, current, count):
+        # 已经走完的bar之后接上正在形成的bar；只复制窗口内的数据
+        bar, position = current
+        start = 0 if count is None else max(0, bar - int(count) + 1)
+        row = partial.row(bar, position)
+        columns = [np.append(getattr(series, column)[start:bar], value)
+                   for column, value in zip(("time",) + FIELDS, row)]
+        window = BarSeries(series.security, series.frequency, *columns)
+        return HistoryFrame(window, 0, len(window))
+
+    def _latest_price(self, security):
+        # 用于给回测标的以外的持仓估值；没有该标的行情时返回None
+        if (security, self._clock.frequency) not in self._feed:
+            return None
+        return self.get_current_price(security)
+
+    def _latest_prices(self, security, times):
+        # _latest_price的向量形式：每个时刻最近走完的bar的收盘价，没有行情或还没有bar时为0
+        if (security, self._clock.frequency) not in self._feed:
+            return np.zeros(len(times))
+        series = self._feed.series(security, self._clock.frequency)
+        ends = np.searchsorted(series.close_time, times, "right")
+        if not len(series):
+            return np.zeros(len(times))
+        return np.where(ends > 0, series.close[np.maximum(ends - 1, 0)], 0.0)
+
+    def _series(self, security):
+        # security在回测频率下的kline
+        if security == self._clock.security:
+            return self._clock
+        return self._feed.series(security, self._clock.frequency)
+
+    def get_current_price(self, security):
+        if security == self._clock.security:
+            return float(self._clock.close[self._index])
+        series = self._feed.series(security, self._clock.frequency)
+        end = self._end(series)
+        if end == 0:
+            return None
+        return float(series.close[end - 1])
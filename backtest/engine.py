@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+# 回测引擎：加载策略文件，执行initialize，然后按context.frequency逐根bar调用handle_data。
+# 主循环只做游标推进、标记价格和调用handle_data，净值曲线在回测结束后由账户流水一次算出（见ledger.py）。
+# 策略声明结束（context.finished）或暂停（context.idle_until、wake_above、wake_below）后，
+# 不需要处理的bar直接跳过，见_resume。
+
+import calendar
+import time
+
+import numpy as np
+import pandas as pd
+
+from .book import FillModel, next_touch
+from .constants import CASH_UNIT, min_order_names, securities
+from .context import Account, Context, Log
+from .data import Data
+from .fills import units
+from .order import Order
+from .strategy import Strategy, load_strategy
+
+
+def parse_time(value):
+    # "2015-01-01 00:00:00" -> 秒
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return calendar.timegm(time.strptime(value, "%Y-%m-%d %H:%M:%S"))
+
+
+class BacktestResult(object):
+    def __init__(self, strategy, context, time, net, logs):
+        self.strategy = strategy
+        self.context = context
+        self.time = time
+        self.net = net
+        self.logs = logs
+
+    @property
+    def orders(self):
+        return self.context.order.records
+
+    @property
+    def account(self):
+        return self.context.account
+
+    @property
+    def total_return(self):
+        # 回测区间内没有bar时不会执行到记录初始账户的地方，account_initial为None
+        if len(self.net) == 0 or self.context.account_initial is None:
+            return 0.0
+        initial = self.context.account_initial.huobi_cny_net
+        if initial == 0:
+            return 0.0
+        return self.net[-1] / initial - 1
+
+    @property
+    def max_drawdown(self):
+        if len(self.net) == 0:
+            return 0.0
+        peak = np.maximum.accumulate(self.net)
+        return float(np.max(1 - self.net / peak))
+
+    def to_frame(self):
+        index = pd.to_datetime(self.time, unit="s")
+        return pd.DataFrame({"net": self.net}, index=index)
+
+    def balances(self):
+        # 账户流水：每次余额变化的时间、余额名称和变化后的余额，回测开始前的初始余额时间为0
+        account = self.context.account
+        return account.ledger.to_frame(account._names)
+
+
+class Engine(object):
+    def __init__(self, feed, log_level="warn", partial_bars=False, memo=None, resting_orders=None):
+        # partial_bars：取比回测频率更粗的kline时附上正在形成的bar，见Data；
+        # memo：多个策略在同一条bar流上运行时共用的get_price缓存（PriceMemo），见bus.py；
+        # resting_orders：不能立即成交的限价单挂单等待成交，为True或FillModel，见book.py
+        self.feed = feed
+        self.log_level = log_level
+        self.partial_bars = partial_bars
+        self.memo = memo
+        self.resting_orders = FillModel() if resting_orders is True else resting_orders or None
+
+    def _context(self, params):
+        data = Data(self.feed, self.partial_bars, self.memo)
+        account = Account(params.get("account_initial", {}), data)
+        log = Log(data, self.log_level)
+        order = Order(data, account, log, params.get("commission", 0.0), params.get("slippage", 0.0),
+                      self.resting_orders)
+        return Context(data, order, account, log)
+
+    def _prepare(self, strategy, params, user_data=None, security=None):
+        # 加载策略、执行initialize（之后用user_data覆盖策略参数），确定回测使用的kline序列和[first, last)区间；
+        # security不为空时把策略改为交易该标的，见_retarget
+        if isinstance(strategy, Strategy) and security is not None:
+            # _retarget会修改策略的全局变量，每次重新加载一份
+            strategy = strategy.path
+        if not isinstance(strategy, Strategy):
+            strategy = load_strategy(strategy)
+        merged = dict(strategy.params)
+        if params:
+            merged.update(params)
+
+        context = self._context(merged)
+        strategy.initialize(context)
+        if user_data:
+            for name, value in user_data.items():
+                setattr(context.user_data, name, value)
+        if security is not None:
+            _retarget(strategy, context, security)
+
+        clock = self.feed.series(context.security, context.frequency)
+        context.data._bind(clock)
+        first = int(np.searchsorted(clock.time, parse_time(merged["start_time"]), "left"))
+        last = int(np.searchsorted(clock.time, parse_time(merged["end_time"]), "left"))
+        if first < last:
+            context.data._advance(first)
+            context.account._mark(context.account._track(context.security), clock.close[first])
+            context.account._mark_held(context.data)
+            context.account_initial = context.account.snapshot()
+        return strategy, context, clock, first, last
+
+    def run(self, strategy, params=None, mode="bar", user_data=None, security=None):
+        # mode="bar"逐根bar调用handle_data；mode="signal"使用策略的vectorized_signal，见signals.py；
+        # mode="events"由挂单成交事件驱动，见_run_events。策略定义了handle_order(context, order)时，挂单成交后调用它
+        if mode == "signal":
+            from .signals import run_signals
+            return run_signals(self, strategy, params, user_data, security)
+        if mode == "events":
+            return self._run_events(strategy, params, user_data, security)
+        if mode != "bar":
+            raise ValueError("不支持的回测模式: %s" % mode)
+
+        strategy, context, clock, first, last = self._prepare(strategy, params, user_data, security)
+        data = context.data
+        account = context.account
+        tracked = account._track(context.security)
+        mark = account._mark
+        held = account._held
+        books = context.order._books
+        triggers = context.order._triggers
+        trailing = context.order._trailing
+        close = clock.close
+        handle_data = strategy.handle_data
+        handle_order = strategy.handle_order
+
+        for i in range(first, last):
+            data._advance(i)
+            mark(tracked, close[i])
+            if held:
+                account._mark_held(data)
+            if books:
+                filled = context.order._match()
+                if filled and handle_order is not None:
+                    for record in filled:
+                        handle_order(context, record)
+            if triggers or trailing:
+                context.order._trigger()
+            handle_data(context)
+            if (context.finished or context.idle_until is not None or context.wake_above is not None
+                    or context.wake_below is not None):
+                # 策略声明结束或暂停，之后跳过不需要处理的bar
+                _resume(strategy, context, clock, i + 1, last)
+                break
+
+        net = _equity(context, clock, first, last)
+        return BacktestResult(strategy, context, clock.close_time[first:last], net, context.log.records)
+
+    def _run_events(self, strategy, params=None, user_data=None, security=None):
+        # 事件驱动：不能立即成交的限价单总是挂单（未设置resting_orders时按FillModel()撮合），
+        # 挂单成交时调用策略的handle_order(context, order)，handle_data只在策略没有挂单的bar上调用（如第一根bar布置网格）。
+        # 策略有挂单时只处理挂单可能成交的bar，见_resume
+        strategy, context, clock, first, last = self._prepare(strategy, params, user_data, security)
+        if context.order._resting is None:
+            context.order._resting = FillModel()
+        _resume(strategy, context, clock, first, last, events=True)
+        net = _equity(context, clock, first, last)
+        return BacktestResult(strategy, context, clock.close_time[first:last], net, context.log.records)
+
+
+class _Range(object):
+    # 回测标的kline的最低价、最高价（分），第一次需要时才换算
+    __slots__ = ("clock", "_columns")
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._columns = None
+
+    def columns(self):
+        if self._columns is None:
+            self._columns = (units(self.clock.low, CASH_UNIT), units(self.clock.high, CASH_UNIT))
+        return self._columns
+
+
+def _asleep(context):
+    return (context.finished or context.idle_until is not None or context.wake_above is not None
+            or context.wake_below is not None)
+
+
+def _awake(context, time, price):
+    # 策略在开盘时间为time、收盘价为price的bar上是否需要调用handle_data；任一唤醒条件满足时醒来并清除所有唤醒条件
+    if context.finished:
+        return False
+    until, above, below = context.idle_until, context.wake_above, context.wake_below
+    if until is None and above is None and below is None:
+        return True
+    if ((until is not None and time >= parse_time(until)) or (above is not None and price >= float(above))
+            or (below is not None and price <= float(below))):
+        context.idle_until = context.wake_above = context.wake_below = None
+        return True
+    return False
+
+
+def _resume(strategy, context, clock, i, last, events=False):
+    # 从第i根bar开始逐根处理，但跳过不需要处理的bar：策略声明了finished/idle_until（见Context），
+    # 或事件驱动模式下策略有挂单时，只处理挂单可能成交、触发单需要检查或策略醒来的bar。
+    # 跳过的bar的净值照常由账户流水算出
+    data = context.data
+    account = context.account
+    order = context.order
+    tracked = account._track(context.security)
+    handle_order = strategy.handle_order
+    extremes = _Range(clock)
+    processed = i - 1
+    while i < last:
+        data._advance(i)
+        account._mark(tracked, clock.close[i])
+        if account._held:
+            account._mark_held(data)
+        if order._books:
+            for record in order._match():
+                if handle_order is not None:
+                    handle_order(context, record)
+        if order._triggers or order._trailing:
+            order._trigger()
+        if _awake(context, clock.time[i], clock.close[i]) and not (events and order._has_open_orders()):
+            strategy.handle_data(context)
+        processed = i
+        i = _next_bar(context, clock, extremes, i + 1, last, events)
+    if processed < last - 1:
+        # 最后几根bar被跳过时，账户仍按最后一根bar的价格标记，回测结束后读取的账户净值与逐根处理相同
+        data._advance(last - 1)
+        account._mark(tracked, clock.close[last - 1])
+        account._mark_held(data)
+
+
+def _next_bar(context, clock, extremes, start, last, events):
+    # 下一根需要处理的bar：策略醒来的bar，或更早的挂单可能成交的bar；有触发单或其他标的的挂单时逐根处理
+    order = context.order
+    if not (_asleep(context) or events and order._has_open_orders()):
+        return start
+    if any(order._triggers.values()) or any(order._trailing.values()):
+        return start
+    security = context.security
+    if any(book for name, book in order._books.items() if name != security):
+        return start
+    wake = last
+    if not context.finished:
+        if context.idle_until is not None:
+            context.idle_until = parse_time(context.idle_until)
+            wake = min(max(int(np.searchsorted(clock.time, context.idle_until, "left")), start), last)
+        if context.wake_above is not None or context.wake_below is not None:
+            # 收盘价第一次越过唤醒价的bar
+            above = None if context.wake_above is None else float(context.wake_above)
+            below = None if context.wake_below is None else float(context.wake_below)
+            wake = next_touch(clock.close, clock.close, start, below, above, end=wake)
+    book = order._books.get(security)
+    if book:
+        low, high = extremes.columns()
+        wake = next_touch(low, high, start, book.best_bid(), book.best_ask(), order._resting.through, wake)
+        # 跳过的bar不会成交，撮合从wake开始
+        book.position = max(book.position, wake)
+    return wake
+
+
+def _equity(context, clock, first, last):
+    # 每根bar收盘时的净值：回测标的按当根bar的收盘价，其余持有过的币种按各自最近走完的bar的收盘价
+    account = context.account
+    times = clock.close_time[first:last]
+    tracked = account._track(context.security)
+    prices = {tracked: clock.close[first:last]}
+    for slot in account.ledger.slots():
+        if slot not in prices:
+            prices[slot] = context.data._latest_prices(account._names[slot], times)
+    return account.ledger.equity(times, prices)
+
+
+def _retarget(strategy, context, security):
+    # 把为一个标的编写的策略（如只交易huobi_cny_btc的策略）用在另一个标的上：context.security、
+    # 相同的context.benchmark、账户中原标的的余额属性和策略全局常量 HUOBI_CNY_BTC_MIN_ORDER_* 都改为指向新标的，
+    # 不必为每个交易对复制一份策略文件
+    native = context.security
+    if security == native:
+        return
+    if security not in securities():
+        raise ValueError("未知的标的: %s，请先用register_security添加" % security)
+    context.security = security
+    if context.benchmark == native:
+        context.benchmark = security
+    context.account._alias(native, security)
+    for native_name, name in zip(min_order_names(native), min_order_names(security)):
+        strategy.namespace[native_name] = strategy.namespace[name]
+
+
+def run(strategy, feed, params=None, log_level="warn", mode="bar", user_data=None, partial_bars=False,
+        security=None, resting_orders=None):
+    return Engine(feed, log_level, partial_bars, resting_orders=resting_orders).run(strategy, params, mode, user_data,
+                                                                                   security)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+# 向量化撮合：给定整段回测的下单意图数组，按order.py的规则（收盘价加减滑点成交、整数的分和聪、
+# 手续费从所得资产中扣除）一次算出每笔意图的结果、手续费和成交后的余额。
+#
+# 下单意图按bar顺序排列，每个字段一个数组：
+#     bar       下单所在bar的位置
+#     side      1买入，-1卖出
+#     limit     限价（元），NaN为市价单
+#     amount    市价买入为金额（元），其余为数量（币）；
+#               NaN表示按下单时的余额决定：买入用掉 现金*fraction（限价买入的数量为 现金/收盘价*fraction），
+#               卖出 持仓*fraction，余额不够最小下单量时不下单，与策略中 if ... >= MIN_ORDER_* 的写法一致；
+#               算出的下单量不够最小下单量时与逐bar模式一样被拒绝
+#     fraction  amount为NaN时使用
+#
+# 余额不变时所有意图的结果都可以一次算出；金额固定的意图成交后余额的变化与余额无关，用累计和得到。
+# 只有按余额下单的意图需要在上一笔成交之后重新计算，逐笔循环的次数是这类成交的次数，而不是bar数。
+
+import numpy as np
+
+from .constants import CASH_UNIT, MIN_ORDER_CASH_AMOUNT, MIN_ORDER_QUANTITY, QUANTITY_UNIT, to_units
+
+SKIPPED, FILLED, CANCELED, REJECTED = 0, 1, 2, 3
+STATUSES = ("skipped", "filled", "canceled", "rejected")
+
+# 每次先计算这么多条意图，没有成交时加倍
+_BLOCK = 16
+
+
+def units(values, unit):
+    # 与constants.to_units相同的四舍五入，按元素换算成最小单位
+    return np.rint(np.asarray(values, dtype=np.float64) * unit).astype(np.int64)
+
+
+class Intents(object):
+    # 下单意图数组，字段见文件开头
+    __slots__ = ("bar", "side", "limit", "amount", "fraction")
+
+    def __init__(self, bar, side, limit=np.nan, amount=np.nan, fraction=1.0):
+        self.bar = np.asarray(bar, dtype=np.int64)
+        length = len(self.bar)
+        self.side = np.broadcast_to(np.asarray(side, dtype=np.int64), (length,))
+        self.limit = np.broadcast_to(np.asarray(limit, dtype=np.float64), (length,))
+        self.amount = np.broadcast_to(np.asarray(amount, dtype=np.float64), (length,))
+        self.fraction = np.broadcast_to(np.asarray(fraction, dtype=np.float64), (length,))
+        if length > 1 and np.any(np.diff(self.bar) < 0):
+            raise ValueError("下单意图必须按bar排序")
+
+    def __len__(self):
+        return len(self.bar)
+
+
+class Fills(object):
+    # simulate_fills的结果，与意图等长：status见STATUSES；quantity为下单数量（聪，市价买入为按成交价换算的数量），
+    # cost为市价买入的金额（分）；成交的意图price为成交价（分），fee为手续费（买入为聪，卖出为分）；
+    # cash、position为这条意图之后的余额（分、聪）
+    __slots__ = ("status", "quantity", "cost", "price", "fee", "cash", "position")
+
+    def __init__(self, length):
+        self.status = np.zeros(length, dtype=np.int8)
+        self.quantity = np.zeros(length, dtype=np.int64)
+        self.cost = np.zeros(length, dtype=np.int64)
+        self.price = np.zeros(length, dtype=np.int64)
+        self.fee = np.zeros(length, dtype=np.int64)
+        self.cash = np.zeros(length, dtype=np.int64)
+        self.position = np.zeros(length, dtype=np.int64)
+
+
+def _evaluate(intents, rows, close, cash, position, security, commission, slippage):
+    # 现金cash（分）、持仓position（聪）不变时rows中每条意图的结果。status是不考虑余额时的状态，
+    # checked的意图还要检查余额是否够need_cash/need_position；成交时余额变化cash_change/position_change
+    side = intents.side[rows]
+    buy = side > 0
+    limit = intents.limit[rows]
+    amount = intents.amount[rows]
+    dependent = np.isnan(amount)
+    fraction = intents.fraction[rows]
+    price = close[intents.bar[rows]]
+    market = np.isnan(limit)
+
+    fill_price = np.where(buy, units(price * (1 + slippage), CASH_UNIT), units(price * (1 - slippage), CASH_UNIT))
+    limit_price = units(np.where(market, 0.0, limit), CASH_UNIT)
+    marketable = market | np.where(buy, limit_price >= fill_price, limit_price <= fill_price)
+
+    available_cash = cash / float(CASH_UNIT)
+    available = position / float(QUANTITY_UNIT)
+    market_buy = buy & market
+    # 按余额下单时的下单量（元或币），与策略中的写法一样用浮点数算出后再换算成最小单位
+    size = np.where(market_buy, available_cash, np.where(buy, available_cash / price, available)) * fraction
+    cost = units(np.where(dependent, size, amount), CASH_UNIT)
+    quantity = units(np.where(dependent, size, amount), QUANTITY_UNIT)
+    quantity = np.where(market_buy, cost * QUANTITY_UNIT // fill_price, quantity)
+    cost = np.where(market_buy, cost, -(-quantity * fill_price // QUANTITY_UNIT))
+    proceeds = quantity * fill_price // QUANTITY_UNIT
+
+    # 按余额下单时与策略中的判断相同，只有现金（买入）或持仓（卖出）不够最小下单量时才不下单；
+    # 下单量不足最小下单量的订单与逐bar模式一样被拒绝
+    minimum = np.where(market_buy, MIN_ORDER_CASH_AMOUNT[security], MIN_ORDER_QUANTITY[security])
+    too_small = np.where(market_buy, cost / float(CASH_UNIT), quantity / float(QUANTITY_UNIT)) < minimum
+    skip = dependent & np.where(buy, available_cash < MIN_ORDER_CASH_AMOUNT[security],
+                                available < MIN_ORDER_QUANTITY[security])
+    status = np.where(skip, SKIPPED, np.where(too_small, REJECTED, np.where(marketable, FILLED, CANCELED)))
+    status = status.astype(np.int8)
+    moves = status == FILLED
+    fee = np.where(buy, units(quantity * commission, 1), units(proceeds * commission, 1))
+    return {
+        "status": status,
+        "dependent": dependent,
+        # 买单先判断是否可成交再检查现金，卖单先检查持仓，所以不可成交的卖单也要检查余额
+        "checked": moves | ((status == CANCELED) & ~buy),
+        "need_cash": np.where(buy, cost, 0),
+        "need_position": np.where(buy, 0, quantity),
+        "cash_change": np.where(moves, np.where(buy, -cost, proceeds - fee), 0),
+        "position_change": np.where(moves, np.where(buy, quantity - fee, -quantity), 0),
+        "quantity": quantity,
+        "cost": np.where(market_buy, cost, 0),
+        "price": fill_price,
+        "fee": fee,
+    }
+
+
+def _evaluate_one(intents, row, close, cash, position, security, commission, slippage):
+    # _evaluate对单条意图的标量版本（按余额下单的意图在上一笔成交之后直接逐条计算，不必构造数组），
+    # 已包含余额检查：返回 (状态, 数量, 市价买入金额, 成交价, 手续费, 现金变化, 持仓变化)
+    buy = intents.side[row] > 0
+    limit = float(intents.limit[row])
+    amount = float(intents.amount[row])
+    dependent = amount != amount
+    fraction = float(intents.fraction[row])
+    price = float(close[intents.bar[row]])
+    market = limit != limit
+
+    fill_price = to_units(price * (1 + slippage) if buy else price * (1 - slippage), CASH_UNIT)
+    available_cash = cash / float(CASH_UNIT)
+    available = position / float(QUANTITY_UNIT)
+    if buy and market:
+        size = available_cash * fraction
+        cost = to_units(size if dependent else amount, CASH_UNIT)
+        quantity = cost * QUANTITY_UNIT // fill_price
+        minimum = MIN_ORDER_CASH_AMOUNT[security]
+        too_small = cost / float(CASH_UNIT) < minimum
+    else:
+        size = (available_cash / price if buy else available) * fraction
+        quantity = to_units(size if dependent else amount, QUANTITY_UNIT)
+        cost = -(-quantity * fill_price // QUANTITY_UNIT)
+        minimum = MIN_ORDER_QUANTITY[security]
+        too_small = quantity / float(QUANTITY_UNIT) < minimum
+    if dependent and (available_cash < MIN_ORDER_CASH_AMOUNT[security] if buy
+                      else available < MIN_ORDER_QUANTITY[security]):
+        return SKIPPED, quantity, 0, 0, 0, 0, 0
+    market_cost = cost if buy and market else 0
+    if too_small:
+        return REJECTED, quantity, market_cost, 0, 0, 0, 0
+    if not buy and quantity > position:
+        return REJECTED, quantity, market_cost, 0, 0, 0, 0
+    if not market:
+        limit_price = to_units(limit, CASH_UNIT)
+        if (limit_price < fill_price) if buy else (limit_price > fill_price):
+            return CANCELED, quantity, market_cost, 0, 0, 0, 0
+    if buy:
+        if cost > cash:
+            return REJECTED, quantity, market_cost, 0, 0, 0, 0
+        fee = int(round(quantity * commission))
+        return FILLED, quantity, market_cost, fill_price, fee, -cost, quantity - fee
+    proceeds = quantity * fill_price // QUANTITY_UNIT
+    fee = int(round(proceeds * commission))
+    return FILLED, quantity, market_cost, fill_price, fee, proceeds - fee, -quantity
+
+
+def _first(mask, default):
+    found = np.flatnonzero(mask)
+    return int(found[0]) if len(found) else default
+
+
+def _exclusive_sum(values, start):
+    # start加上每个位置之前（不含）的累计和
+    return start + np.cumsum(values) - values
+
+
+def simulate_fills(close, intents, cash, position, security, commission=0.0, slippage=0.0):
+    # close为回测频率的收盘价；cash、position为初始现金和持仓（元、币）。返回Fills
+    fills = Fills(len(intents))
+    cash = to_units(cash, CASH_UNIT)
+    position = to_units(position, QUANTITY_UNIT)
+    waits = np.isnan(intents.amount)
+    # run_end[i]：从i开始连续的同方向、按余额下单的意图在哪里结束
+    boundaries = np.flatnonzero((np.diff(intents.side) != 0) | (np.diff(waits) != 0)) + 1
+    run_end = np.append(boundaries, len(intents))[np.searchsorted(boundaries, np.arange(len(intents)), "right")]
+    dependent = waits.tolist()
+    sides = intents.side.tolist()
+    start = 0
+    block = _BLOCK
+    changed = False
+    while start < len(intents):
+        if dependent[start] and (changed or start and sides[start] != sides[start - 1]):
+            # 刚有成交或者换了方向时，按余额下单的这条意图多半会成交，直接计算这一条；
+            # 连续不下单的意图（如现金已经不够最小下单量）仍然按块一次算出
+            status, quantity, cost, price, fee, cash_change, position_change = _evaluate_one(
+                intents, start, close, cash, position, security, commission, slippage)
+            cash += cash_change
+            position += position_change
+            fills.status[start] = status
+            fills.quantity[start] = quantity
+            fills.cost[start] = cost
+            fills.price[start] = price
+            fills.fee[start] = fee
+            fills.cash[start] = cash
+            fills.position[start] = position
+            changed = status == FILLED
+            start += 1
+            if status == SKIPPED and (cash / float(CASH_UNIT) < MIN_ORDER_CASH_AMOUNT[security] if sides[start - 1] > 0
+                                      else position / float(QUANTITY_UNIT) < MIN_ORDER_QUANTITY[security]):
+                # 余额已经不够最小下单量，这一串同方向的意图都不会下单
+                end = int(run_end[start - 1])
+                fills.cash[start:end] = cash
+                fills.position[start:end] = position
+                start = end
+            continue
+        end = min(len(intents), start + block)
+        result = _evaluate(intents, slice(start, end), close, cash, position, security, commission, slippage)
+        status, checked = result["status"], result["checked"]
+        # 假设之前的意图都按不考虑余额时的状态成交，得到每条意图之前的余额
+        moves = status == FILLED
+        funded = ((result["need_cash"] <= _exclusive_sum(result["cash_change"], cash))
+                  & (result["need_position"] <= _exclusive_sum(result["position_change"], position)))
+        after_move = _exclusive_sum(moves, 0) > 0
+
+        # 结果有效的前缀：到第一条余额不足的意图（含）为止；按余额下单的意图只在此前没有成交时有效，
+        # 它自己成交之后，后面的意图也要按新的余额重新计算
+        length = end - start
+        waits = result["dependent"]
+        stop = min(_first(checked & ~funded, length - 1) + 1,
+                   _first(waits & after_move, length),
+                   _first(waits & moves, length - 1) + 1)
+        status = status[:stop]
+        status[checked[:stop] & ~funded[:stop]] = REJECTED
+        filled = status == FILLED
+        rows = slice(start, start + stop)
+        fills.status[rows] = status
+        fills.quantity[rows] = result["quantity"][:stop]
+        fills.cost[rows] = result["cost"][:stop]
+        fills.price[rows] = np.where(filled, result["price"][:stop], 0)
+        fills.fee[rows] = np.where(filled, result["fee"][:stop], 0)
+        fills.cash[rows] = cash + np.cumsum(np.where(filled, result["cash_change"][:stop], 0))
+        fills.position[rows] = position + np.cumsum(np.where(filled, result["position_change"][:stop], 0))
+        cash = int(fills.cash[start + stop - 1])
+        position = int(fills.position[start + stop - 1])
+        changed = bool(filled.any())
+        block = block * 2 if stop == length and not changed else _BLOCK
+        start += stop
+    return fills
+
+
+def apply_fills(context, intents, fills):
+    # 把simulate_fills的结果写入context：每条下了单的意图生成一条订单记录，账户余额在成交的bar上更新
+    # （记入账户流水），日志与逐笔下单相同
+    order = context.order
+    account = context.account
+    data = context.data
+    security = context.security
+    index = account._index[security]
+    rows = np.flatnonzero(fills.status != SKIPPED)
+    columns = zip(intents.bar[rows].tolist(), intents.side[rows].tolist(), intents.limit[rows].tolist(),
+                  fills.status[rows].tolist(), fills.quantity[rows].tolist(), fills.cost[rows].tolist(),
+                  fills.price[rows].tolist(), fills.fee[rows].tolist(), fills.cash[rows].tolist(),
+                  fills.position[rows].tolist())
+    for bar, side, limit, status, quantity, cost, price, fee, cash, position in columns:
+        data._advance(bar)
+        buy = side > 0
+        quantity = quantity / float(QUANTITY_UNIT)
+        if limit != limit:
+            if buy:
+                cash_amount = cost / float(CASH_UNIT)
+                record = order._new(security, "buy", "market", cash_amount=cash_amount)
+                too_small = cash_amount < MIN_ORDER_CASH_AMOUNT[security]
+            else:
+                record = order._new(security, "sell", "market", quantity=quantity)
+                too_small = quantity < MIN_ORDER_QUANTITY[security]
+        else:
+            record = order._new(security, "buy" if buy else "sell", "limit",
+                                price=to_units(limit, CASH_UNIT) / float(CASH_UNIT), quantity=quantity)
+            too_small = quantity < MIN_ORDER_QUANTITY[security]
+
+        if status == REJECTED:
+            if too_small and limit != limit and buy:
+                order._reject(record, "下单金额 %s 小于最小下单金额" % record.cash_amount)
+            elif too_small:
+                order._reject(record, "下单数量 %s 小于最小下单数量" % record.quantity)
+            else:
+                order._reject(record, "现金不足" if buy else "持仓不足")
+        elif status == CANCELED:
+            record.status = "canceled"
+            if buy:
+                order._log.warn("限价买单 %s 的价格 %s 低于市价，未成交" % (record.id, record.price))
+            else:
+                order._log.warn("限价卖单 %s 的价格 %s 高于市价，未成交" % (record.id, record.price))
+        else:
+            account._set_cash(cash)
+            account._set(index, position)
+            record.filled_time = data._now
+            record.filled_price = price / float(CASH_UNIT)
+            record.filled_quantity = quantity
+            record.fee = fee / float(QUANTITY_UNIT if buy else CASH_UNIT)
+            record.status = "filled"
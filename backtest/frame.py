@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+# get_price返回的轻量历史数据：策略只用到 hist["close"]、hist.index、.iloc、.values、
+# .rolling(...)、.shift、算术和比较运算等少数接口，这里直接在行情数组的视图上实现这些接口，
+# 不必每根bar都构造pandas.DataFrame。访问其它属性时才生成真正的DataFrame/Series。
+#
+# 整数下标和切片一律按位置解释（与旧版pandas对DatetimeIndex的行为一致），
+# 例如 hist["close"][-1]、emv[len(emv)-1]。
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+from .constants import FIELDS
+
+
+def _datetime_index(time):
+    return pd.DatetimeIndex(time.astype("datetime64[s]").astype("datetime64[ns]"))
+
+
+def _windows(values, window):
+    # 长度为window的滑动窗口视图，形状为(len(values)-window+1, window)
+    stride = values.strides[0]
+    return as_strided(values, shape=(len(values) - window + 1, window), strides=(stride, stride), writeable=False)
+
+
+class _Indexer(object):
+    # .iloc：切片返回同类型的轻量对象，其余情况交给pandas
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def __getitem__(self, key):
+        return self._owner._position(key)
+
+
+class HistoryColumn(object):
+    # hist["close"] 等单列数据，values为只读的numpy视图，time为对应的bar开始时间
+    __slots__ = ("values", "_time", "_series")
+
+    def __init__(self, values, time):
+        self.values = values
+        self._time = time
+        self._series = None
+
+    def _new(self, values):
+        return HistoryColumn(values, self._time)
+
+    def _position(self, key):
+        if isinstance(key, slice):
+            return HistoryColumn(self.values[key], self._time[key])
+        if isinstance(key, (int, np.integer)):
+            return self.values[key]
+        if isinstance(key, HistoryColumn):
+            # 比较运算得到的布尔序列，如 hist["close"][hist["close"] > x]
+            key = key.values
+        return self._materialize().iloc[key]
+
+    def _materialize(self):
+        if self._series is None:
+            self._series = pd.Series(self.values, index=_datetime_index(self._time))
+        return self._series
+
+    def __getattr__(self, name):
+        return getattr(self._materialize(), name)
+
+    @property
+    def iloc(self):
+        return _Indexer(self)
+
+    @property
+    def index(self):
+        return self._time.view("datetime64[s]")
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, key):
+        return self._position(key)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+    def __repr__(self):
+        return repr(self._materialize())
+
+    def _operand(self, other):
+        return other.values if isinstance(other, HistoryColumn) else other
+
+    def __add__(self, other):
+        return self._new(self.values + self._operand(other))
+
+    def __radd__(self, other):
+        return self._new(self._operand(other) + self.values)
+
+    def __sub__(self, other):
+        return self._new(self.values - self._operand(other))
+
+    def __rsub__(self, other):
+        return self._new(self._operand(other) - self.values)
+
+    def __mul__(self, other):
+        return self._new(self.values * self._operand(other))
+
+    def __rmul__(self, other):
+        return self._new(self._operand(other) * self.values)
+
+    def __truediv__(self, other):
+        return self._new(self.values / self._operand(other))
+
+    def __rtruediv__(self, other):
+        return self._new(self._operand(other) / self.values)
+
+    def __lt__(self, other):
+        return self._new(self.values < self._operand(other))
+
+    def __le__(self, other):
+        return self._new(self.values <= self._operand(other))
+
+    def __gt__(self, other):
+        return self._new(self.values > self._operand(other))
+
+    def __ge__(self, other):
+        return self._new(self.values >= self._operand(other))
+
+    def __eq__(self, other):
+        return self._new(self.values == self._operand(other))
+
+    def __ne__(self, other):
+        return self._new(self.values != self._operand(other))
+
+    # 定义了__eq__，与pandas.Series一样不可哈希
+    __hash__ = None
+
+    def __neg__(self):
+        return self._new(-self.values)
+
+    def __abs__(self):
+        return self._new(np.abs(self.values))
+
+    # 供np.mean/np.max等调用的归约方法
+    def sum(self, axis=None, dtype=None, out=None, **kwargs):
+        return self.values.sum(axis=axis, dtype=dtype, out=out)
+
+    def mean(self, axis=None, dtype=None, out=None, **kwargs):
+        return self.values.mean(axis=axis, dtype=dtype, out=out)
+
+    def max(self, axis=None, out=None, **kwargs):
+        return self.values.max(axis=axis, out=out)
+
+    def min(self, axis=None, out=None, **kwargs):
+        return self.values.min(axis=axis, out=out)
+
+    def shift(self, periods=1):
+        # 移动的位数超过长度时与pandas一样全部为NaN
+        values = np.empty(len(self.values), dtype=np.float64)
+        periods = max(-len(values), min(periods, len(values)))
+        if periods >= 0:
+            values[:periods] = np.nan
+            values[periods:] = self.values[:len(values) - periods]
+        else:
+            values[periods:] = np.nan
+            values[:periods] = self.values[-periods:]
+        return self._new(values)
+
+    def rolling(self, window):
+        return _Rolling(self, window)
+
+
+class _Rolling(object):
+    # hist["close"].rolling(window=n)，与pandas一致，前window-1个值为NaN
+    __slots__ = ("_column", "_window")
+
+    def __init__(self, column, window):
+        self._column = column
+        self._window = int(window)
+
+    def _apply(self, reduce):
+        values = self._column.values
+        result = np.full(len(values), np.nan)
+        if len(values) >= self._window:
+            result[self._window - 1:] = reduce(_windows(values, self._window), axis=1)
+        return self._column._new(result)
+
+    def sum(self):
+        return self._apply(np.sum)
+
+    def mean(self):
+        return self._apply(np.mean)
+
+    def max(self):
+        return self._apply(np.max)
+
+    def min(self):
+        return self._apply(np.min)
+
+    def std(self):
+        return self._apply(lambda windows, axis: np.std(windows, axis=axis, ddof=1))
+
+
+class HistoryFrame(object):
+    # get_price的返回值，只保存行情序列和[start, end)窗口位置
+    __slots__ = ("_series", "_start", "_end", "_frame")
+
+    def __init__(self, series, start, end):
+        self._series = series
+        self._start = start
+        self._end = end
+        self._frame = None
+
+    def _materialize(self):
+        if self._frame is None:
+            columns = dict((field, self[field].values) for field in FIELDS)
+            self._frame = pd.DataFrame(columns, index=_datetime_index(self._time()), columns=list(FIELDS))
+        return self._frame
+
+    def __getattr__(self, name):
+        return getattr(self._materialize(), name)
+
+    def _time(self):
+        return self._series.time[self._start:self._end]
+
+    def _position(self, key):
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, end, _ = key.indices(self._end - self._start)
+            return HistoryFrame(self._series, self._start + start, self._start + max(start, end))
+        return self._materialize().iloc[key]
+
+    def __getitem__(self, key):
+        if isinstance(key, HistoryColumn):
+            # 布尔序列筛选行，如 hist[hist["close"] > x]
+            return self._materialize()[key.values]
+        if key in FIELDS:
+            return HistoryColumn(getattr(self._series, key)[self._start:self._end], self._time())
+        return self._materialize()[key]
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __repr__(self):
+        return repr(self._materialize())
+
+    @property
+    def iloc(self):
+        return _Indexer(self)
+
+    @property
+    def index(self):
+        return self._time().view("datetime64[s]")
+
+    @property
+    def columns(self):
+        return list(FIELDS)
+
+    @property
+    def values(self):
+        return np.column_stack([getattr(self._series, field)[self._start:self._end] for field in FIELDS])
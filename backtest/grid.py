@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# 挂单网格：在每个网格价位预先挂限价单（低于当前价的价位挂买单，高于当前价的挂卖单），
+# 某一档的买单成交后在上一档挂卖单，卖单成交后在下一档挂买单。需要开启挂单簿（resting_orders），
+# 与事件驱动模式（mode="events"）一起使用时，引擎只在挂单成交时调用策略的handle_order，
+# 不需要逐根bar执行handle_data。
+#
+#     from backtest.grid import LimitGrid
+#
+#     def handle_data(context):
+#         # 事件驱动模式下只在没有挂单的bar上调用：以当前价为中心布置网格
+#         price = context.data.get_current_price(context.security)
+#         levels = [price * (1 + 0.01 * k) for k in range(-50, 51)]
+#         context.user_data.grid = LimitGrid(context.order, context.security, levels, 0.1)
+#         context.user_data.grid.place(price)
+#
+#     def handle_order(context, order):
+#         context.user_data.grid.on_fill(order)
+#
+#     result = run("挂单网格策略.py", store, mode="events")
+
+
+class LimitGrid(object):
+    # prices为网格价位（元，任意数量），每档下单quantity个；_levels为 挂单中的订单号 -> 档位
+    __slots__ = ("order", "security", "prices", "quantity", "_levels")
+
+    def __init__(self, order, security, prices, quantity):
+        self.order = order
+        self.security = security
+        self.prices = sorted(float(price) for price in prices)
+        self.quantity = quantity
+        self._levels = {}
+
+    def __len__(self):
+        return len(self._levels)
+
+    def place(self, price):
+        # 在低于price的档位挂买单、高于price的档位挂卖单，等于price的档位空出
+        for level, level_price in enumerate(self.prices):
+            if level_price < price:
+                self._buy(level)
+            elif level_price > price:
+                self._sell(level)
+
+    def on_fill(self, record):
+        # 网格中的订单成交后在相邻档位挂反向的单；不是本网格的订单时不做任何事
+        level = self._levels.pop(record.id, None)
+        if level is None:
+            return
+        if record.side == "buy":
+            if level + 1 < len(self.prices):
+                self._sell(level + 1)
+        elif level > 0:
+            self._buy(level - 1)
+
+    def cancel(self):
+        # 撤销网格中所有挂单
+        for id in sorted(self._levels):
+            self.order.cancel_order(id)
+        self._levels.clear()
+
+    def _buy(self, level):
+        self._track(self.order.buy_limit(self.security, self.prices[level], self.quantity), level)
+
+    def _sell(self, level):
+        self._track(self.order.sell_limit(self.security, self.prices[level], self.quantity), level)
+
+    def _track(self, id, level):
+        # 挂单中的订单记下档位；下单时已经立即成交的（当前价已越过该档）直接继续挂相邻档位
+        record = self.order.get_order(id)
+        if record.status == "open":
+            self._levels[id] = level
+        elif record.status == "filled":
+            self._levels[id] = level
+            self.on_fill(record)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+# 流式技术指标：每根新bar O(1)更新，策略通过 context.indicators 获取。
+
+from .batch import ema_matrix, sma_matrix
+from .ema import DMA, EMA, MACD, SMA, TEMA
+from .extrema import Aroon, Donchian, DualThrust, RollingMax, RollingMin, Stochastic, WilliamsR
+from .registry import Indicators
+from .wilder import ATR, CMO, DMI, NATR, RSI
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# 参数轴批量指标：一次计算一组周期在整段历史上的均线，返回 (周期数, bar数) 的矩阵，
+# 第i行与 talib.SMA/EMA(close, periods[i]) 一致（浮点误差内），未就绪的位置为NaN。
+# 供参数扫描使用，同一条收盘价不必为每组参数重复平滑，见 backtest/batch.py。
+
+import numpy as np
+
+NAN = float("nan")
+
+# 分块计算EMA时块内权重 (1-k)^-j 的上限，块越长numpy调用越少，但不能让权重溢出
+_MAX_WEIGHT_EXPONENT = 100.0
+
+
+def _periods(periods):
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.int64))
+    if len(periods) and periods.min() < 1:
+        raise ValueError("均线周期必须大于0")
+    return periods
+
+
+def sma_matrix(close, windows):
+    close = np.asarray(close, dtype=np.float64)
+    windows = _periods(windows)
+    n = len(close)
+    out = np.full((len(windows), n), NAN)
+    if not n or not len(windows):
+        return out
+    # 在长度不小于最大窗口的块内分别累加：窗口两端最多跨两个相邻的块，
+    # 累加和的量级只有一块的大小，不会随历史长度增大而损失精度
+    block = int(min(windows.max(), n))
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = close
+    inclusive = np.cumsum(padded.reshape(blocks, block), axis=1)
+    totals = inclusive[:, -1]
+    inclusive = inclusive.reshape(-1)[:n]
+    exclusive = inclusive - close
+    index = np.arange(n)
+    for row, window in enumerate(windows.tolist()):
+        if window > n:
+            continue
+        end = index[window - 1:]
+        start = end - window + 1
+        head = start // block
+        same = head == end // block
+        tail = np.where(same, -exclusive[start], totals[head] - exclusive[start])
+        out[row, window - 1:] = (inclusive[end] + tail) / window
+    return out
+
+
+def _ema(close, period, out):
+    # 与talib一致：前period个值的简单平均作为初值，之后 y = y + k * (x - y)。
+    # 递推 y[j] = d * y[j-1] + k * x[j] (d = 1 - k) 在长度为block的块内展开成
+    #     y[j] = d^(j+1) * c + d^j * cumsum(k * x[i] * d^-i)
+    # c是上一块的最后一个值，块内全部是向量运算，只有块与块之间的衔接需要逐块进行
+    n = len(close)
+    if period > n:
+        return
+    k = 2.0 / (period + 1)
+    seed = close[:period].sum() / period
+    out[period - 1] = seed
+    x = close[period:]
+    if not len(x):
+        return
+    d = 1.0 - k
+    if d == 0.0:
+        out[period:] = x
+        return
+    block = int(min(len(x), max(1.0, _MAX_WEIGHT_EXPONENT / -np.log10(d))))
+    blocks = -(-len(x) // block)
+    padded = np.zeros(blocks * block)
+    padded[:len(x)] = x
+    powers = d ** np.arange(block + 1)
+    local = np.cumsum(padded.reshape(blocks, block) * (k / powers[:block]), axis=1) * powers[:block]
+
+    carry = np.empty(blocks)
+    last = local[:, -1].tolist()
+    decay = powers[block]
+    value = seed
+    for b in range(blocks):
+        carry[b] = value
+        value = last[b] + decay * value
+    local += carry[:, None] * powers[1:]
+    out[period:] = local.reshape(-1)[:len(x)]
+
+
+def ema_matrix(close, periods):
+    close = np.asarray(close, dtype=np.float64)
+    periods = _periods(periods)
+    out = np.full((len(periods), len(close)), NAN)
+    for row, period in enumerate(periods.tolist()):
+        _ema(close, period, out[row])
+    return out
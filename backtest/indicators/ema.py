@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# 流式均线类指标：每来一根bar只做O(1)的更新，结果与talib在同一段完整历史上的输出一致。
+# 未就绪时指标值为NaN；previous保存上一根bar的值，用于判断交叉。
+
+import math
+
+NAN = float("nan")
+
+try:
+    import talib
+except ImportError:  # talib只用于预热时的校验
+    talib = None
+
+
+class SMA(object):
+    __slots__ = ("period", "value", "previous", "count", "_buffer", "_sum")
+    inputs = ("close",)
+
+    def __init__(self, period):
+        self.period = int(period)
+        self.value = NAN
+        self.previous = NAN
+        self.count = 0
+        self._buffer = [0.0] * self.period
+        self._sum = 0.0
+
+    def update(self, x):
+        position = self.count % self.period
+        self._sum += x - self._buffer[position]
+        self._buffer[position] = x
+        self.count += 1
+        if position == self.period - 1:
+            # 每转一圈重新求和一次，避免长时间累加的浮点误差
+            self._sum = math.fsum(self._buffer)
+        self.previous = self.value
+        if self.count >= self.period:
+            self.value = self._sum / self.period
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, close):
+        return (talib.SMA(close, timeperiod=self.period)[-1],)
+
+
+class EMA(object):
+    # 与talib一致：前period个值的简单平均作为初值，之后 value += k * (x - value)，k = 2 / (period + 1)
+    __slots__ = ("period", "k", "value", "previous", "count", "_sum")
+    inputs = ("close",)
+
+    def __init__(self, period):
+        self.period = int(period)
+        self.k = 2.0 / (self.period + 1)
+        self.value = NAN
+        self.previous = NAN
+        self.count = 0
+        self._sum = 0.0
+
+    def seed(self, value, count):
+        # 直接给定初值（MACD中快线的初值不是从第一根bar开始算的）
+        self.value = value
+        self.count = count
+
+    def update(self, x):
+        self.count += 1
+        self.previous = self.value
+        if self.count > self.period:
+            self.value = (x - self.value) * self.k + self.value
+        elif self.count == self.period:
+            self.value = (self._sum + x) / self.period
+        else:
+            self._sum += x
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, close):
+        return (talib.EMA(close, timeperiod=self.period)[-1],)
+
+
+class MACD(object):
+    # DIF = EMA(fast) - EMA(slow)，DEA = EMA(DIF, signal)，MACD柱 hist = DIF - DEA。
+    # talib中快线与慢线在同一根bar上开始输出，快线的初值取慢线初值窗口中最后fast个收盘价的均值
+    __slots__ = ("fast_period", "slow_period", "signal_period", "macd", "signal", "hist",
+                 "previous_hist", "count", "_fast", "_slow", "_signal", "_warmup")
+    inputs = ("close",)
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        fast_period, slow_period = int(fast_period), int(slow_period)
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.signal_period = int(signal_period)
+        self.macd = self.signal = self.hist = self.previous_hist = NAN
+        self.count = 0
+        self._fast = EMA(fast_period)
+        self._slow = EMA(slow_period)
+        self._signal = EMA(self.signal_period)
+        self._warmup = []
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.slow_period:
+            self._warmup.append(x)
+            return self.hist
+        if self.count == self.slow_period:
+            self._warmup.append(x)
+            self._slow.seed(math.fsum(self._warmup) / self.slow_period, self.slow_period)
+            self._fast.seed(math.fsum(self._warmup[-self.fast_period:]) / self.fast_period, self.fast_period)
+            self._warmup = None
+        else:
+            self._fast.update(x)
+            self._slow.update(x)
+        self.macd = self._fast.value - self._slow.value
+        self.signal = self._signal.update(self.macd)
+        self.previous_hist = self.hist
+        self.hist = self.macd - self.signal
+        return self.hist
+
+    def current(self):
+        return (self.macd, self.signal, self.hist)
+
+    def reference(self, close):
+        macd, signal, hist = talib.MACD(close, fastperiod=self.fast_period, slowperiod=self.slow_period,
+                                        signalperiod=self.signal_period)
+        return (macd[-1], signal[-1], hist[-1])
+
+
+class TEMA(object):
+    # TEMA = 3 * EMA1 - 3 * EMA2 + EMA3，EMA2为EMA1的EMA，EMA3为EMA2的EMA
+    __slots__ = ("period", "value", "previous", "_ema1", "_ema2", "_ema3")
+    inputs = ("close",)
+
+    def __init__(self, period):
+        self.period = int(period)
+        self.value = self.previous = NAN
+        self._ema1 = EMA(period)
+        self._ema2 = EMA(period)
+        self._ema3 = EMA(period)
+
+    def update(self, x):
+        ema1 = self._ema1.update(x)
+        if self._ema1.count < self.period:
+            return self.value
+        ema2 = self._ema2.update(ema1)
+        if self._ema2.count < self.period:
+            return self.value
+        ema3 = self._ema3.update(ema2)
+        if self._ema3.count < self.period:
+            return self.value
+        self.previous = self.value
+        self.value = 3 * ema1 - 3 * ema2 + ema3
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, close):
+        return (talib.TEMA(close, timeperiod=self.period)[-1],)
+
+
+class DMA(object):
+    # DMA = SMA(short) - SMA(long)，AMA = SMA(DMA, ama)
+    __slots__ = ("short_period", "long_period", "ama_period", "dma", "ama",
+                 "previous_dma", "previous_ama", "_short", "_long", "_ama")
+    inputs = ("close",)
+
+    def __init__(self, short_period=10, long_period=50, ama_period=10):
+        self.short_period = int(short_period)
+        self.long_period = int(long_period)
+        self.ama_period = int(ama_period)
+        self.dma = self.ama = self.previous_dma = self.previous_ama = NAN
+        self._short = SMA(short_period)
+        self._long = SMA(long_period)
+        self._ama = SMA(ama_period)
+
+    def update(self, x):
+        self._short.update(x)
+        self._long.update(x)
+        if self._long.count < self.long_period or self._short.count < self.short_period:
+            return self.dma
+        self.previous_dma, self.previous_ama = self.dma, self.ama
+        self.dma = self._short.value - self._long.value
+        self.ama = self._ama.update(self.dma)
+        return self.dma
+
+    def current(self):
+        return (self.dma, self.ama)
+
+    def reference(self, close):
+        dma = talib.SMA(close, timeperiod=self.short_period) - talib.SMA(close, timeperiod=self.long_period)
+        return (dma[-1], talib.SMA(dma, timeperiod=self.ama_period)[-1])
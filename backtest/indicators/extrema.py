@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+# 滚动最大/最小值：单调队列，每根bar均摊O(1)更新，同时给出极值所在的bar。
+# 唐奇安通道、Dual Thrust、阿隆指标、威廉指标和KDJ都建立在它之上。
+
+from collections import deque
+
+from .ema import EMA, NAN, SMA
+
+try:
+    import talib
+except ImportError:  # talib只用于预热时的校验
+    talib = None
+
+
+class RollingMax(object):
+    # 最近window根bar的最大值；index为最大值所在bar的序号（从0开始计数），相同值取最近的一根（与talib一致）
+    __slots__ = ("window", "inputs", "value", "previous", "index", "count", "_indices", "_values", "_sign")
+
+    def __init__(self, window, field="high"):
+        self.window = int(window)
+        self.inputs = (field,)
+        self.value = self.previous = NAN
+        self.index = -1
+        self.count = 0
+        self._indices = deque()
+        self._values = deque()
+        self._sign = 1.0
+
+    def update(self, x):
+        # 队列中的值单调递减，队首即窗口内的最大值；RollingMin存入相反数复用同一逻辑
+        key = self._sign * x
+        values, indices = self._values, self._indices
+        while values and values[-1] <= key:
+            values.pop()
+            indices.pop()
+        values.append(key)
+        indices.append(self.count)
+        if indices[0] <= self.count - self.window:
+            values.popleft()
+            indices.popleft()
+        self.count += 1
+        self.previous = self.value
+        if self.count >= self.window:
+            self.value = self._sign * values[0]
+            self.index = indices[0]
+        return self.value
+
+    @property
+    def offset(self):
+        # 极值出现在多少根bar之前，0表示当前bar
+        return self.count - 1 - self.index
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, values):
+        return (talib.MAX(values, timeperiod=self.window)[-1],)
+
+
+class RollingMin(RollingMax):
+    __slots__ = ()
+
+    def __init__(self, window, field="low"):
+        RollingMax.__init__(self, window, field)
+        self._sign = -1.0
+
+    def reference(self, values):
+        return (talib.MIN(values, timeperiod=self.window)[-1],)
+
+
+class Donchian(object):
+    # 唐奇安通道：upper为最近window根bar最高价的最大值，lower为最低价的最小值
+    __slots__ = ("window", "upper", "lower", "previous_upper", "previous_lower", "_max", "_min")
+    inputs = ("high", "low")
+
+    def __init__(self, window):
+        self.window = int(window)
+        self._max = RollingMax(window)
+        self._min = RollingMin(window)
+        self.upper = self.lower = self.previous_upper = self.previous_lower = NAN
+
+    def update(self, high, low):
+        self.previous_upper, self.previous_lower = self.upper, self.lower
+        self.upper = self._max.update(high)
+        self.lower = self._min.update(low)
+        return self.upper
+
+    def current(self):
+        return (self.upper, self.lower)
+
+    def reference(self, high, low):
+        return (talib.MAX(high, timeperiod=self.window)[-1], talib.MIN(low, timeperiod=self.window)[-1])
+
+
+class DualThrust(object):
+    # Dual Thrust的波动区间：range = max(HH - LC, HC - LL)，均取最近window根bar。
+    # 策略中的区间不含当前bar，对应previous_range
+    __slots__ = ("window", "range", "previous_range", "_hh", "_hc", "_lc", "_ll")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, window):
+        self.window = int(window)
+        self._hh = RollingMax(window)
+        self._hc = RollingMax(window)
+        self._lc = RollingMin(window)
+        self._ll = RollingMin(window)
+        self.range = self.previous_range = NAN
+
+    def update(self, high, low, close):
+        hh = self._hh.update(high)
+        hc = self._hc.update(close)
+        lc = self._lc.update(close)
+        ll = self._ll.update(low)
+        self.previous_range = self.range
+        if self._hh.count >= self.window:
+            self.range = max(hh - lc, hc - ll)
+        return self.range
+
+    def current(self):
+        return (self.range,)
+
+    def reference(self, high, low, close):
+        w = self.window
+        return (max(high[-w:].max() - close[-w:].min(), close[-w:].max() - low[-w:].min()),)
+
+
+class Aroon(object):
+    # 阿隆指标，与talib.AROON一致：在最近window+1根bar中找最高/最低价出现的位置
+    __slots__ = ("window", "up", "down", "previous_up", "previous_down", "_max", "_min")
+    inputs = ("high", "low")
+
+    def __init__(self, window):
+        self.window = int(window)
+        self._max = RollingMax(self.window + 1)
+        self._min = RollingMin(self.window + 1)
+        self.up = self.down = self.previous_up = self.previous_down = NAN
+
+    def update(self, high, low):
+        self._max.update(high)
+        self._min.update(low)
+        if self._max.count > self.window:
+            factor = 100.0 / self.window
+            self.previous_up, self.previous_down = self.up, self.down
+            self.up = factor * (self.window - self._max.offset)
+            self.down = factor * (self.window - self._min.offset)
+        return self.up
+
+    def current(self):
+        return (self.down, self.up)
+
+    def reference(self, high, low):
+        down, up = talib.AROON(high, low, timeperiod=self.window)
+        return (down[-1], up[-1])
+
+
+class WilliamsR(object):
+    # 威廉指标 %R = (HH - close) / (HH - LL) * -100
+    __slots__ = ("window", "value", "previous", "_max", "_min")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, window):
+        self.window = int(window)
+        self._max = RollingMax(window)
+        self._min = RollingMin(window)
+        self.value = self.previous = NAN
+
+    def update(self, high, low, close):
+        highest = self._max.update(high)
+        lowest = self._min.update(low)
+        if self._max.count >= self.window:
+            self.previous = self.value
+            diff = (highest - lowest) / -100.0
+            self.value = (highest - close) / diff if diff != 0 else 0.0
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, high, low, close):
+        return (talib.WILLR(high, low, close, timeperiod=self.window)[-1],)
+
+
+_MA_TYPES = {0: SMA, 1: EMA}
+
+
+class Stochastic(object):
+    # KDJ中的K、D线，与talib.STOCH一致；平滑方式支持 matype 0=SMA, 1=EMA
+    __slots__ = ("fastk_period", "slowk_period", "slowk_matype", "slowd_period", "slowd_matype",
+                 "k", "d", "previous_k", "previous_d", "_max", "_min", "_slowk", "_slowd")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0):
+        if slowk_matype not in _MA_TYPES or slowd_matype not in _MA_TYPES:
+            raise ValueError("Stochastic只支持matype 0(SMA)和1(EMA)")
+        self.fastk_period = int(fastk_period)
+        self.slowk_period = int(slowk_period)
+        self.slowk_matype = slowk_matype
+        self.slowd_period = int(slowd_period)
+        self.slowd_matype = slowd_matype
+        self._max = RollingMax(self.fastk_period)
+        self._min = RollingMin(self.fastk_period)
+        self._slowk = _MA_TYPES[slowk_matype](self.slowk_period)
+        self._slowd = _MA_TYPES[slowd_matype](self.slowd_period)
+        self.k = self.d = self.previous_k = self.previous_d = NAN
+
+    def update(self, high, low, close):
+        highest = self._max.update(high)
+        lowest = self._min.update(low)
+        if self._max.count < self.fastk_period:
+            return self.k
+        diff = (highest - lowest) / 100.0
+        slowk = self._slowk.update((close - lowest) / diff if diff != 0 else 0.0)
+        if self._slowk.count < self.slowk_period:
+            return self.k
+        slowd = self._slowd.update(slowk)
+        if self._slowd.count < self.slowd_period:
+            return self.k
+        self.previous_k, self.previous_d = self.k, self.d
+        self.k, self.d = slowk, slowd
+        return self.k
+
+    def current(self):
+        return (self.k, self.d)
+
+    def reference(self, high, low, close):
+        k, d = talib.STOCH(high, low, close, fastk_period=self.fastk_period, slowk_period=self.slowk_period,
+                           slowk_matype=self.slowk_matype, slowd_period=self.slowd_period,
+                           slowd_matype=self.slowd_matype)
+        return (k[-1], d[-1])
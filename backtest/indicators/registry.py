@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# 策略中的 context.indicators：每个(指标, 标的, 频率, 参数)只保留一个流式指标对象，
+# 每次访问时把上次之后新走完的bar喂给它。第一次访问时用全部已有历史预热，
+# 预热后（装有talib时）与talib在同一段历史上的结果做一次校验。
+#
+# 没有流式实现的计算（例如策略在最近N根日线上调用talib）可以用cached：结果按
+# (函数, 标的, 频率, 窗口, 参数)缓存，只有该频率走完新的bar时才重新计算，
+# 60m回测中使用日线指标时每24根bar只算一次。
+
+import numpy as np
+
+from . import ema, extrema, wilder
+
+RTOL = 1e-8
+
+
+class _Bound(object):
+    __slots__ = ("indicator", "series", "position", "columns")
+
+    def __init__(self, indicator, series):
+        self.indicator = indicator
+        self.series = series
+        self.position = 0
+        self.columns = tuple(getattr(series, name) for name in indicator.inputs)
+
+    def sync(self, end):
+        # tolist()得到Python float，逐个更新比numpy标量快得多
+        update = self.indicator.update
+        columns = self.columns
+        if len(columns) == 1:
+            for x in columns[0][self.position:end].tolist():
+                update(x)
+        else:
+            for row in zip(*[column[self.position:end].tolist() for column in columns]):
+                update(*row)
+        self.position = end
+
+
+class Indicators(object):
+    __slots__ = ("_data", "_bound", "_cached", "check")
+
+    def __init__(self, data, check=True):
+        self._data = data
+        self._bound = {}
+        self._cached = {}
+        self.check = check
+
+    def get(self, cls, security, frequency=None, *params):
+        data = self._data
+        frequency = frequency or data._clock.frequency
+        key = (cls, security, frequency) + params
+        bound = self._bound.get(key)
+        if bound is None:
+            bound = self._bound[key] = _Bound(cls(*params), data._feed.series(security, frequency))
+            bound.sync(data._end(bound.series))
+            if self.check and ema.talib is not None:
+                _check(bound)
+        else:
+            end = data._end(bound.series)
+            if end != bound.position:
+                bound.sync(end)
+        return bound.indicator
+
+    def cached(self, function, security, count, frequency=None, *args):
+        # 返回 function(get_price(security, count, frequency), *args)，该频率没有新的bar时直接使用上次的结果
+        data = self._data
+        frequency = frequency or data._clock.frequency
+        key = (function, security, frequency, count) + args
+        version = data._version(data._feed.series(security, frequency))
+        entry = self._cached.get(key)
+        if entry is None or entry[0] != version:
+            entry = self._cached[key] = (version, function(data.get_price(security, count, frequency), *args))
+        return entry[1]
+
+    def sma(self, security, period, frequency=None):
+        return self.get(ema.SMA, security, frequency, period)
+
+    def ema(self, security, period, frequency=None):
+        return self.get(ema.EMA, security, frequency, period)
+
+    def macd(self, security, fast_period=12, slow_period=26, signal_period=9, frequency=None):
+        return self.get(ema.MACD, security, frequency, fast_period, slow_period, signal_period)
+
+    def tema(self, security, period, frequency=None):
+        return self.get(ema.TEMA, security, frequency, period)
+
+    def dma(self, security, short_period=10, long_period=50, ama_period=10, frequency=None):
+        return self.get(ema.DMA, security, frequency, short_period, long_period, ama_period)
+
+    def atr(self, security, period=14, frequency=None):
+        return self.get(wilder.ATR, security, frequency, period)
+
+    def natr(self, security, period=14, frequency=None):
+        return self.get(wilder.NATR, security, frequency, period)
+
+    def rsi(self, security, period=14, frequency=None):
+        return self.get(wilder.RSI, security, frequency, period)
+
+    def cmo(self, security, period=14, frequency=None):
+        return self.get(wilder.CMO, security, frequency, period)
+
+    def dmi(self, security, period=14, frequency=None):
+        return self.get(wilder.DMI, security, frequency, period)
+
+    def rolling_max(self, security, window, field="high", frequency=None):
+        return self.get(extrema.RollingMax, security, frequency, window, field)
+
+    def rolling_min(self, security, window, field="low", frequency=None):
+        return self.get(extrema.RollingMin, security, frequency, window, field)
+
+    def donchian(self, security, window, frequency=None):
+        return self.get(extrema.Donchian, security, frequency, window)
+
+    def dual_thrust(self, security, window, frequency=None):
+        return self.get(extrema.DualThrust, security, frequency, window)
+
+    def aroon(self, security, window, frequency=None):
+        return self.get(extrema.Aroon, security, frequency, window)
+
+    def willr(self, security, window, frequency=None):
+        return self.get(extrema.WilliamsR, security, frequency, window)
+
+    def stoch(self, security, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0,
+              frequency=None):
+        return self.get(extrema.Stochastic, security, frequency, fastk_period, slowk_period, slowk_matype,
+                        slowd_period, slowd_matype)
+
+
+def _check(bound):
+    if bound.position == 0:
+        return
+    arrays = [np.ascontiguousarray(column[:bound.position], dtype=np.float64) for column in bound.columns]
+    expected = np.array(bound.indicator.reference(*arrays), dtype=np.float64)
+    actual = np.array(bound.indicator.current(), dtype=np.float64)
+    # talib的输出在全部指标就绪前为NaN，这里只比较talib已经有输出的部分
+    # 指标差值（DIF、MACD柱、DMA）可能接近0，绝对误差按价格的量级放宽
+    ready = ~np.isnan(expected)
+    scale = abs(float(arrays[0][-1])) or 1.0
+    if not np.allclose(actual[ready], expected[ready], rtol=RTOL, atol=RTOL * scale):
+        raise ValueError("%s 流式计算结果 %s 与talib结果 %s 不一致" % (type(bound.indicator).__name__, actual, expected))
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+# 流式Wilder平滑类指标：ATR、NATR、RSI、CMO、DMI(+DI/-DI/ADX)。
+# Wilder平滑是递归的，talib在不同长度的历史上会算出不同的结果；这里的状态跨bar保存，
+# 等价于talib在从第一根bar开始的完整历史上的输出，与策略每次取多少根bar无关。
+
+from .ema import NAN
+
+try:
+    import talib
+except ImportError:  # talib只用于预热时的校验
+    talib = None
+
+
+def _is_zero(value):
+    # 与talib的TA_IS_ZERO一致
+    return -1e-8 < value < 1e-8
+
+
+def _true_range(high, low, previous_close):
+    true_range = high - low
+    if abs(high - previous_close) > true_range:
+        true_range = abs(high - previous_close)
+    if abs(low - previous_close) > true_range:
+        true_range = abs(low - previous_close)
+    return true_range
+
+
+class ATR(object):
+    # 第一个ATR为前period个真实波幅（从第二根bar起）的均值，之后 atr = (atr * (period - 1) + tr) / period
+    __slots__ = ("period", "value", "previous", "count", "_close", "_sum")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.value = self.previous = NAN
+        self.count = 0
+        self._close = NAN
+        self._sum = 0.0
+
+    def update(self, high, low, close):
+        self.count += 1
+        if self.count > 1:
+            true_range = _true_range(high, low, self._close)
+            if self.count > self.period + 1:
+                self.previous = self.value
+                self.value = (self.value * (self.period - 1) + true_range) / self.period
+            else:
+                self._sum += true_range
+                if self.count == self.period + 1:
+                    self.value = self._sum / self.period
+        self._close = close
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, high, low, close):
+        return (talib.ATR(high, low, close, timeperiod=self.period)[-1],)
+
+
+class NATR(object):
+    # NATR = ATR / close * 100
+    __slots__ = ("period", "value", "previous", "_atr")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.value = self.previous = NAN
+        self._atr = ATR(period)
+
+    @property
+    def atr(self):
+        return self._atr.value
+
+    def update(self, high, low, close):
+        atr = self._atr.update(high, low, close)
+        if atr == atr:
+            self.previous = self.value
+            self.value = (atr / close) * 100.0 if close != 0 else 0.0
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+    def reference(self, high, low, close):
+        return (talib.NATR(high, low, close, timeperiod=self.period)[-1],)
+
+
+class _GainLoss(object):
+    # RSI和CMO共用的平均涨幅/平均跌幅
+    __slots__ = ("period", "value", "previous", "count", "gain", "loss", "_close")
+    inputs = ("close",)
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.value = self.previous = NAN
+        self.count = 0
+        self.gain = self.loss = 0.0
+        self._close = NAN
+
+    def update(self, close):
+        # 前period个涨跌幅先累加，第period个时取均值，之后每根bar做一次Wilder平滑
+        self.count += 1
+        if self.count > 1:
+            change = close - self._close
+            period = self.period
+            if self.count > period + 1:
+                self.gain *= period - 1
+                self.loss *= period - 1
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            if self.count > period:
+                self.gain /= period
+                self.loss /= period
+                self.previous = self.value
+                self.value = self._output(self.gain, self.loss)
+        self._close = close
+        return self.value
+
+    def current(self):
+        return (self.value,)
+
+
+class RSI(_GainLoss):
+    __slots__ = ()
+
+    def _output(self, gain, loss):
+        total = gain + loss
+        return 100.0 * (gain / total) if not _is_zero(total) else 0.0
+
+    def reference(self, close):
+        return (talib.RSI(close, timeperiod=self.period)[-1],)
+
+
+class CMO(_GainLoss):
+    __slots__ = ()
+
+    def _output(self, gain, loss):
+        total = gain + loss
+        return 100.0 * ((gain - loss) / total) if not _is_zero(total) else 0.0
+
+    def reference(self, close):
+        return (talib.CMO(close, timeperiod=self.period)[-1],)
+
+
+class DMI(object):
+    # 动向指标：+DI、-DI从第period根bar起输出，ADX从第2*period-1根bar起输出（与talib一致）
+    __slots__ = ("period", "plus_di", "minus_di", "adx", "previous_plus_di", "previous_minus_di",
+                 "previous_adx", "count", "_high", "_low", "_close", "_plus_dm", "_minus_dm", "_tr", "_sum_dx")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.plus_di = self.minus_di = self.adx = NAN
+        self.previous_plus_di = self.previous_minus_di = self.previous_adx = NAN
+        self.count = 0
+        self._high = self._low = self._close = NAN
+        self._plus_dm = self._minus_dm = self._tr = self._sum_dx = 0.0
+
+    def update(self, high, low, close):
+        self.count += 1
+        if self.count == 1:
+            self._high, self._low, self._close = high, low, close
+            return self.adx
+        period = self.period
+        diff_plus = high - self._high
+        diff_minus = self._low - low
+        true_range = _true_range(high, low, self._close)
+        self._high, self._low, self._close = high, low, close
+
+        if self.count > period:
+            # 前period-1根bar只累加，之后每根bar先衰减再累加
+            self._plus_dm -= self._plus_dm / period
+            self._minus_dm -= self._minus_dm / period
+            self._tr = self._tr - self._tr / period + true_range
+        else:
+            self._tr += true_range
+        if diff_minus > 0 and diff_plus < diff_minus:
+            self._minus_dm += diff_minus
+        elif diff_plus > 0 and diff_plus > diff_minus:
+            self._plus_dm += diff_plus
+        if self.count <= period:
+            return self.adx
+
+        self.previous_plus_di, self.previous_minus_di = self.plus_di, self.minus_di
+        dx = None
+        if _is_zero(self._tr):
+            self.plus_di = self.minus_di = 0.0
+        else:
+            self.plus_di = 100.0 * (self._plus_dm / self._tr)
+            self.minus_di = 100.0 * (self._minus_dm / self._tr)
+            total = self.minus_di + self.plus_di
+            if not _is_zero(total):
+                dx = 100.0 * (abs(self.minus_di - self.plus_di) / total)
+        # DX为0/0时talib跳过这根bar，ADX保持不变
+        if self.count <= 2 * period:
+            if dx is not None:
+                self._sum_dx += dx
+            if self.count == 2 * period:
+                self.adx = self._sum_dx / period
+        elif dx is not None:
+            self.previous_adx = self.adx
+            self.adx = (self.adx * (period - 1) + dx) / period
+        return self.adx
+
+    def current(self):
+        return (self.plus_di, self.minus_di, self.adx)
+
+    def reference(self, high, low, close):
+        return (talib.PLUS_DI(high, low, close, timeperiod=self.period)[-1],
+                talib.MINUS_DI(high, low, close, timeperiod=self.period)[-1],
+                talib.ADX(high, low, close, timeperiod=self.period)[-1])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# 账户流水：余额每变化一次追加一行 (时间, 余额位置, 变化后的余额)，按列保存在定长类型的array中。
+# 两次变化之间余额不变，任意时刻的余额用二分查找向前取得，所以净值曲线
+#     净值 = 现金 + Σ 余额 * 价格
+# 可以在回测结束后对所有bar一次算出，主循环不需要每根bar保存账户状态。
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# 现金在流水中的余额位置，其余为Account中各币种余额数组的下标
+CASH = -1
+
+
+class Ledger(object):
+    __slots__ = ("time", "slot", "balance")
+
+    def __init__(self):
+        self.time = array("q")
+        self.slot = array("i")
+        self.balance = array("d")
+
+    def __len__(self):
+        return len(self.time)
+
+    def append(self, time, slot, balance):
+        self.time.append(time)
+        self.slot.append(slot)
+        self.balance.append(balance)
+
+    def _columns(self):
+        # 复制成numpy数组：直接引用array的缓冲区会让之后的append无法扩容
+        return (np.array(self.time, dtype=np.int64), np.array(self.slot, dtype=np.int32),
+                np.array(self.balance, dtype=np.float64))
+
+    def slots(self):
+        # 出现过非零余额的币种位置（不含现金）
+        time, slot, balance = self._columns()
+        return sorted(set(slot[(slot != CASH) & (balance != 0)].tolist()))
+
+    def balances(self, slot, times):
+        # 每个时刻（含该时刻的变化）slot的余额，第一次记录之前为0
+        time, slots, balance = self._columns()
+        rows = slots == slot
+        time, balance = time[rows], balance[rows]
+        positions = np.searchsorted(time, times, "right") - 1
+        if not len(balance):
+            return np.zeros(len(times))
+        return np.where(positions >= 0, balance[np.maximum(positions, 0)], 0.0)
+
+    def equity(self, times, prices):
+        # prices：{币种位置: 与times等长的价格数组}，返回每个时刻的 现金 + Σ 余额 * 价格，
+        # 求和顺序与Account.huobi_cny_net相同
+        value = np.zeros(len(times))
+        for slot in sorted(prices):
+            value += self.balances(slot, times) * prices[slot]
+        return self.balances(CASH, times) + value
+
+    def to_frame(self, names):
+        # names为Account中各余额位置对应的名称，返回每次余额变化的 time, name, balance
+        time, slot, balance = self._columns()
+        return pd.DataFrame({
+            "time": pd.to_datetime(time, unit="s"),
+            "name": ["huobi_cny_cash" if index == CASH else names[index] for index in slot.tolist()],
+            "balance": balance,
+        }, columns=["time", "name", "balance"])
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+
+# 策略中的 context.order：市价单 buy/sell 与限价单 buy_limit/sell_limit。
+# 订单在当前bar收盘价上撮合，买入价格加上滑点、卖出价格减去滑点，手续费从所得资产中扣除。
+# 数量、金额和价格可以是数字或字符串，下单时换算成整数的最小单位（见constants.CASH_UNIT），
+# 成交金额、手续费和余额都按整数计算：卖出所得向下取整、限价买入的花费向上取整到分，手续费四舍五入。
+# 与托管平台一致，限价单的参数顺序为 buy_limit(security, price, quantity)。
+# 不能立即成交的限价单默认撤销；开启挂单簿（resting_orders）时挂单等待之后的bar成交，见book.py。
+# 计划委托和止盈止损委托（plan_buy/plan_sell/take_profit_stop_loss）在触发后下单，见triggers.py；
+# 跟踪委托（trailing_buy/trailing_sell）见trailing.py。
+
+from .book import OrderBook, _Resting
+from .constants import CASH_UNIT, MIN_ORDER_CASH_AMOUNT, MIN_ORDER_QUANTITY, QUANTITY_UNIT, to_units
+from .trailing import TrailingBook
+from .triggers import FALLING, KINDS, RISING, Trigger, TriggerBook
+
+
+class OrderRecord(object):
+    __slots__ = ("id", "time", "security", "side", "type", "price", "quantity", "cash_amount",
+                 "filled_time", "filled_price", "filled_quantity", "fee", "status")
+
+    def __init__(self, id, time, security, side, type, price=None, quantity=None, cash_amount=None):
+        self.id = id
+        self.time = time
+        self.security = security
+        self.side = side
+        self.type = type
+        self.price = price
+        self.quantity = quantity
+        self.cash_amount = cash_amount
+        self.filled_time = None
+        self.filled_price = None
+        self.filled_quantity = 0.0
+        self.fee = 0.0
+        self.status = "open"
+
+    def __repr__(self):
+        return "OrderRecord(%s %s %s %s %s)" % (self.id, self.side, self.type, self.security, self.status)
+
+
+class Order(object):
+    __slots__ = ("_data", "_account", "_log", "_commission", "_slippage", "_resting", "_books", "_triggers",
+                 "_trailing", "records", "triggers")
+
+    def __init__(self, data, account, log, commission=0.0, slippage=0.0, resting=None):
+        # resting为FillModel时，不能立即成交的限价单挂在挂单簿中等待之后的bar成交，见book.py
+        self._data = data
+        self._account = account
+        self._log = log
+        self._commission = commission
+        self._slippage = slippage
+        self._resting = resting
+        self._books = {}
+        self._triggers = {}
+        self._trailing = {}
+        self.records = []
+        self.triggers = []
+
+    def _new(self, security, side, type, price=None, quantity=None, cash_amount=None):
+        record = OrderRecord(len(self.records) + 1, self._data._now, security, side, type,
+                             price, quantity, cash_amount)
+        self.records.append(record)
+        return record
+
+    def _reject(self, record, message):
+        record.status = "rejected"
+        self._log.error("订单 %s 被拒绝: %s" % (record.id, message))
+        return record.id
+
+    def _market_price(self, security, slippage):
+        # 带滑点的成交价，单位为分
+        return to_units(self._data.get_current_price(security) * (1 + slippage), CASH_UNIT)
+
+    def _fill(self, record, quantity, price, cash):
+        # quantity（聪）以price（分/币）成交，cash为现金的变化（分）；
+        # 买入的手续费从买到的币中扣除，卖出的手续费从所得现金中扣除
+        account = self._account
+        index = account._index[record.security]
+        if record.side == "buy":
+            fee = int(round(quantity * self._commission))
+            account._set_cash(account._cash_units + cash)
+            account._set(index, account._units[index] + quantity - fee)
+            record.fee = fee / float(QUANTITY_UNIT)
+        else:
+            fee = int(round(cash * self._commission))
+            account._set_cash(account._cash_units + cash - fee)
+            account._set(index, account._units[index] - quantity)
+            record.fee = fee / float(CASH_UNIT)
+        record.filled_time = self._data._now
+        record.filled_price = price / float(CASH_UNIT)
+        record.filled_quantity = quantity / float(QUANTITY_UNIT)
+        record.status = "filled"
+        return record.id
+
+    def buy(self, security, cash_amount):
+        cost = to_units(cash_amount, CASH_UNIT)
+        record = self._new(security, "buy", "market", cash_amount=cost / float(CASH_UNIT))
+        if record.cash_amount < MIN_ORDER_CASH_AMOUNT[security]:
+            return self._reject(record, "下单金额 %s 小于最小下单金额" % record.cash_amount)
+        if cost > self._account._free_cash():
+            return self._reject(record, "现金不足")
+        price = self._market_price(security, self._slippage)
+        return self._fill(record, cost * QUANTITY_UNIT // price, price, -cost)
+
+    def sell(self, security, quantity):
+        units = to_units(quantity, QUANTITY_UNIT)
+        record = self._new(security, "sell", "market", quantity=units / float(QUANTITY_UNIT))
+        if record.quantity < MIN_ORDER_QUANTITY[security]:
+            return self._reject(record, "下单数量 %s 小于最小下单数量" % record.quantity)
+        if units > self._account._free(self._account._index[security]):
+            return self._reject(record, "持仓不足")
+        price = self._market_price(security, -self._slippage)
+        return self._fill(record, units, price, units * price // QUANTITY_UNIT)
+
+    def buy_limit(self, security, price, quantity):
+        units = to_units(quantity, QUANTITY_UNIT)
+        limit = to_units(price, CASH_UNIT)
+        record = self._new(security, "buy", "limit", price=limit / float(CASH_UNIT),
+                           quantity=units / float(QUANTITY_UNIT))
+        if record.quantity < MIN_ORDER_QUANTITY[security]:
+            return self._reject(record, "下单数量 %s 小于最小下单数量" % record.quantity)
+        market_price = self._market_price(security, self._slippage)
+        if limit < market_price:
+            if self._resting is not None:
+                return self._rest(record, units, limit)
+            record.status = "canceled"
+            self._log.warn("限价买单 %s 的价格 %s 低于市价，未成交" % (record.id, record.price))
+            return record.id
+        # 花费向上取整到分
+        cost = -(-units * market_price // QUANTITY_UNIT)
+        if cost > self._account._free_cash():
+            return self._reject(record, "现金不足")
+        return self._fill(record, units, market_price, -cost)
+
+    def sell_limit(self, security, price, quantity):
+        units = to_units(quantity, QUANTITY_UNIT)
+        limit = to_units(price, CASH_UNIT)
+        record = self._new(security, "sell", "limit", price=limit / float(CASH_UNIT),
+                           quantity=units / float(QUANTITY_UNIT))
+        if record.quantity < MIN_ORDER_QUANTITY[security]:
+            return self._reject(record, "下单数量 %s 小于最小下单数量" % record.quantity)
+        if units > self._account._free(self._account._index[security]):
+            return self._reject(record, "持仓不足")
+        market_price = self._market_price(security, -self._slippage)
+        if limit > market_price:
+            if self._resting is not None:
+                return self._rest(record, units, limit)
+            record.status = "canceled"
+            self._log.warn("限价卖单 %s 的价格 %s 高于市价，未成交" % (record.id, record.price))
+            return record.id
+        return self._fill(record, units, market_price, units * market_price // QUANTITY_UNIT)
+
+    def _rest(self, record, quantity, price):
+        # 把限价单挂入挂单簿并冻结资金：买单冻结 数量*限价（向上取整到分），卖单冻结下单数量
+        account = self._account
+        security = record.security
+        if record.side == "buy":
+            reserved = -(-quantity * price // QUANTITY_UNIT)
+            if reserved > account._free_cash():
+                return self._reject(record, "现金不足")
+            account._freeze_cash(reserved)
+        else:
+            reserved = quantity
+            account._freeze(account._index[security], reserved)
+        book = self._books.get(security)
+        if book is None:
+            book = self._books[security] = OrderBook()
+        if not book:
+            # 从下一根bar开始撮合
+            book.position = self._data._end(self._data._series(security))
+        book.add(_Resting(record, quantity, price, reserved))
+        return record.id
+
+    def _match(self):
+        # 每根bar在handle_data之前调用：用各标的新走完的bar撮合挂单，返回成交的订单记录（按成交顺序）
+        data = self._data
+        filled = []
+        for security, book in self._books.items():
+            if not book:
+                continue
+            series = data._series(security)
+            end = data._end(series)
+            for bar in range(book.position, end):
+                for resting, price in book.match(series.open[bar], series.high[bar], series.low[bar],
+                                                 self._resting, self._slippage):
+                    self._fill_resting(resting, price)
+                    filled.append(resting.record)
+                if not book:
+                    break
+            book.position = end
+        return filled
+
+    def _release(self, resting):
+        account = self._account
+        if resting.record.side == "buy":
+            account._freeze_cash(-resting.reserved)
+        else:
+            account._freeze(account._index[resting.record.security], -resting.reserved)
+
+    def _fill_resting(self, resting, price):
+        self._release(resting)
+        record = resting.record
+        quantity = resting.quantity
+        if record.side == "buy":
+            cost = -(-quantity * price // QUANTITY_UNIT)
+            self._fill(record, quantity, price, -cost)
+        else:
+            self._fill(record, quantity, price, quantity * price // QUANTITY_UNIT)
+
+    def get_order(self, order_id):
+        # 按订单号查询订单记录，status为 "open"(挂单中)、"filled"、"canceled" 或 "rejected"
+        if not 0 < order_id <= len(self.records):
+            raise KeyError("没有订单 %s" % order_id)
+        return self.records[order_id - 1]
+
+    def _has_open_orders(self):
+        for book in self._books.values():
+            if book:
+                return True
+        return False
+
+    def get_open_orders(self, security=None):
+        # 挂单中的订单，按订单号排序
+        books = self._books.values() if security is None else [self._books.get(security)]
+        orders = [record for book in books if book for record in book.orders()]
+        return sorted(orders, key=lambda record: record.id)
+
+    def cancel_order(self, order_id):
+        # 撤销挂单并解冻资金；订单已经成交或撤销时返回False
+        record = self.get_order(order_id)
+        book = self._books.get(record.security)
+        resting = None if book is None else book.cancel(order_id)
+        if resting is None:
+            return False
+        self._release(resting)
+        record.status = "canceled"
+        return True
+
+    def plan_buy(self, security, trigger_price, price=None, quantity=None, cash_amount=None):
+        # 计划委托买入：最新价不低于trigger_price时，给出price时以限价单买入quantity个，否则以市价单买入cash_amount元
+        if price is None:
+            if cash_amount is None:
+                raise ValueError("市价计划委托买入需要cash_amount")
+            return self._plan(security, trigger_price, "buy", "market", cash_amount=float(cash_amount)).id
+        if quantity is None:
+            raise ValueError("限价计划委托需要price和quantity")
+        return self._plan(security, trigger_price, "buy", "limit", float(price), float(quantity)).id
+
+    def plan_sell(self, security, trigger_price, price=None, quantity=None):
+        # 计划委托卖出：最新价不高于trigger_price时，给出price时以限价单卖出，否则以市价单卖出quantity个
+        if quantity is None:
+            raise ValueError("计划委托卖出需要quantity")
+        if price is None:
+            return self._plan(security, trigger_price, "sell", "market", quantity=float(quantity)).id
+        return self._plan(security, trigger_price, "sell", "limit", float(price), float(quantity)).id
+
+    def take_profit_stop_loss(self, security, side, take_profit_trigger_price, take_profit_price,
+                              stop_loss_trigger_price, stop_loss_price, quantity=None, cash_amount=None):
+        # 止盈止损委托：卖出时最新价不低于止盈触发价或不高于止损触发价，以对应委托价限价卖出quantity个；
+        # 买入时最新价不高于止盈触发价或不低于止损触发价，以对应委托价限价买入 cash_amount/委托价 个。
+        # 先触发的一个下单，另一个随之撤销。返回 (止盈触发单编号, 止损触发单编号)
+        take_profit_trigger_price = float(take_profit_trigger_price)
+        stop_loss_trigger_price = float(stop_loss_trigger_price)
+        if side == "buy":
+            if take_profit_trigger_price >= stop_loss_trigger_price:
+                raise ValueError("止盈/止损 买入委托中，止盈触发价格应该小于止损触发价格")
+            if cash_amount is None:
+                raise ValueError("止盈/止损 买入委托需要cash_amount")
+            directions = (FALLING, RISING)
+            sizes = {"cash_amount": float(cash_amount)}
+        elif side == "sell":
+            if take_profit_trigger_price <= stop_loss_trigger_price:
+                raise ValueError("止盈/止损 卖出委托中，止盈触发价格应该大于止损触发价格")
+            if quantity is None:
+                raise ValueError("止盈/止损 卖出委托需要quantity")
+            directions = (RISING, FALLING)
+            sizes = {"quantity": float(quantity)}
+        else:
+            raise ValueError("委托方向只能是 'buy' 或者 'sell': %s" % side)
+        take_profit = self._new_trigger(security, "take_profit", directions[0], take_profit_trigger_price, side,
+                                        "limit", float(take_profit_price), **sizes)
+        stop_loss = self._new_trigger(security, "stop_loss", directions[1], stop_loss_trigger_price, side,
+                                      "limit", float(stop_loss_price), **sizes)
+        take_profit.group = stop_loss.id
+        stop_loss.group = take_profit.id
+        return take_profit.id, stop_loss.id
+
+    def _plan(self, security, trigger_price, side, type, price=None, quantity=None, cash_amount=None):
+        direction = RISING if side == "buy" else FALLING
+        return self._new_trigger(security, "plan", direction, float(trigger_price), side, type, price,
+                                 quantity, cash_amount)
+
+    def trailing_buy(self, security, trigger_price, tracking_range, cash_amount):
+        # 跟踪委托买入：最新价不高于trigger_price后记录最低价，从最低价反弹tracking_range%时以市价单买入cash_amount元
+        trigger = self._new_trigger(security, "trailing", FALLING, float(trigger_price), "buy", "market",
+                                    cash_amount=float(cash_amount), tracking_range=float(tracking_range))
+        return trigger.id
+
+    def trailing_sell(self, security, trigger_price, tracking_range, quantity):
+        # 跟踪委托卖出：最新价不低于trigger_price后记录最高价，从最高价回调tracking_range%时以市价单卖出quantity个
+        trigger = self._new_trigger(security, "trailing", RISING, float(trigger_price), "sell", "market",
+                                    quantity=float(quantity), tracking_range=float(tracking_range))
+        return trigger.id
+
+    def _new_trigger(self, security, kind, direction, trigger_price, side, type, price=None, quantity=None,
+                     cash_amount=None, tracking_range=None):
+        if security not in self._account._index:
+            raise KeyError("不支持的标的: %s" % security)
+        if kind not in KINDS:
+            raise ValueError("不支持的触发单类型: %s" % kind)
+        trigger = Trigger(len(self.triggers) + 1, self._data._now, security, kind, direction, trigger_price,
+                          side, type, price, quantity, cash_amount, tracking_range=tracking_range)
+        self.triggers.append(trigger)
+        if kind == "trailing":
+            book = self._trailing.get(security)
+            if book is None:
+                book = self._trailing[security] = TrailingBook()
+            getattr(book, side).add(trigger.id, trigger_price, trigger.tracking_range)
+            return trigger
+        book = self._triggers.get(security)
+        if book is None:
+            book = self._triggers[security] = TriggerBook()
+        book.add(trigger)
+        return trigger
+
+    def _trigger(self):
+        # 每根bar在handle_data之前调用：用各标的的最新价检查触发单和跟踪委托，触发的按编号顺序下单
+        for security, book in self._triggers.items():
+            if not book:
+                continue
+            for trigger in book.cross(self._data.get_current_price(security)):
+                if trigger.group is not None:
+                    sibling = book.cancel(trigger.group)
+                    if sibling is not None:
+                        sibling.status = "canceled"
+                self._fire(trigger)
+        for security, book in self._trailing.items():
+            if not book:
+                continue
+            for id in book.update(self._data.get_current_price(security)):
+                self._fire(self.triggers[id - 1])
+
+    def _fire(self, trigger):
+        trigger.status = "triggered"
+        trigger.triggered_time = self._data._now
+        self._log.info("触发单 %s 被触发，触发价为 %s 元" % (trigger.id, trigger.trigger_price))
+        trigger.order_id = self._place(trigger)
+
+    def _place(self, trigger):
+        security = trigger.security
+        if trigger.type == "market":
+            if trigger.side == "buy":
+                return self.buy(security, trigger.cash_amount)
+            return self.sell(security, trigger.quantity)
+        quantity = trigger.quantity
+        if quantity is None:
+            # 止盈止损买入：与止盈止损委托下单.py相同，现金不少于委托金额才下单
+            quantity = trigger.cash_amount / trigger.price
+            if to_units(trigger.cash_amount, CASH_UNIT) > self._account._free_cash():
+                record = self._new(security, "buy", "limit", price=trigger.price, quantity=quantity)
+                return self._reject(record, "现金不足")
+        if trigger.side == "buy":
+            return self.buy_limit(security, trigger.price, quantity)
+        return self.sell_limit(security, trigger.price, quantity)
+
+    def get_trigger(self, trigger_id):
+        # 按编号查询触发单，status为 "open"(等待触发)、"triggered"(已下单，订单号为order_id) 或 "canceled"
+        if not 0 < trigger_id <= len(self.triggers):
+            raise KeyError("没有触发单 %s" % trigger_id)
+        return self.triggers[trigger_id - 1]
+
+    def get_open_triggers(self, security=None):
+        # 等待触发的触发单（含跟踪委托），按编号排序
+        return [trigger for trigger in self.triggers
+                if trigger.status == "open" and (security is None or trigger.security == security)]
+
+    def get_trailing_extreme(self, trigger_id):
+        # 跟踪委托达到触发价后记录的最高（卖出）/最低（买入）价，尚未达到触发价或已经结束时为None
+        trigger = self.get_trigger(trigger_id)
+        book = self._trailing.get(trigger.security)
+        if trigger.kind != "trailing" or book is None:
+            return None
+        return getattr(book, trigger.side).extreme_of(trigger_id)
+
+    def cancel_trigger(self, trigger_id):
+        # 撤销触发单，止盈止损委托的两个触发单一起撤销；已经触发或撤销时返回False
+        trigger = self.get_trigger(trigger_id)
+        if trigger.kind == "trailing":
+            book = self._trailing.get(trigger.security)
+            if book is None or not getattr(book, trigger.side).cancel(trigger_id):
+                return False
+            trigger.status = "canceled"
+            return True
+        book = self._triggers.get(trigger.security)
+        if book is None or book.cancel(trigger_id) is None:
+            return False
+        trigger.status = "canceled"
+        if trigger.group is not None and book.cancel(trigger.group) is not None:
+            self.triggers[trigger.group - 1].status = "canceled"
+        return True
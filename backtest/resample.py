@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# 由1m kline生成更粗的频率。除了完整的bar以外，还为每根1m bar记录它所在的粗频率bar
+# 截止到这根1m bar为止的部分结果（最高价、最低价、成交量），回测时在一根日线走完之前，
+# get_price(..., frequency="1d")可以直接取出正在形成中的当日bar，不需要临时重新聚合。
+
+import numpy as np
+
+from .constants import FREQUENCIES
+
+SOURCE = "1m"
+
+# 各频率bar边界的起点（秒，UTC）：周线从周一开始，1970-01-05是周一，其余频率从0点开始
+ORIGINS = {"1w": 4 * 24 * 60 * 60}
+
+PARTIAL_COLUMNS = ("index", "high", "low", "volume")
+
+
+def derived_frequencies():
+    return [frequency for frequency in FREQUENCIES if FREQUENCIES[frequency] > FREQUENCIES[SOURCE]]
+
+
+def _segment_scan(values, starts, ufunc):
+    # 分段的累计运算：out[i] = ufunc.reduce(values[starts[i]:i+1])。
+    # 每一轮把间隔翻倍，段内最多有period/60根1m bar，所以最多十几轮向量运算
+    out = np.array(values, dtype=np.float64)
+    reach = np.arange(len(out)) - starts
+    shift = 1
+    while len(out) and shift <= reach.max():
+        combined = ufunc(out[shift:], out[:-shift])
+        out[shift:] = np.where(reach[shift:] >= shift, combined, out[shift:])
+        shift *= 2
+    return out
+
+
+def resample(minute, frequency, utc_offset=0):
+    # minute为1m的BarSeries；utc_offset是bar边界所在时区相对UTC的偏移（秒），如北京时间为 8 * 3600。
+    # 返回 (粗频率的time, open, high, low, close, volume) 和部分bar数组 {index, high, low, volume}，
+    # 部分bar数组与1m数据等长，index是每根1m bar所在粗频率bar的位置
+    period = FREQUENCIES[frequency]
+    origin = ORIGINS.get(frequency, 0) - utc_offset
+    time = (minute.time - origin) // period * period + origin
+    length = len(time)
+    if length == 0:
+        empty = np.zeros(0)
+        bars = (np.zeros(0, dtype=np.int64), empty, empty, empty, empty, empty)
+        return bars, {"index": np.zeros(0, dtype=np.int64), "high": empty, "low": empty, "volume": empty}
+
+    heads = np.flatnonzero(np.concatenate(([True], time[1:] != time[:-1])))
+    tails = np.concatenate((heads[1:], [length])) - 1
+    index = np.repeat(np.arange(len(heads), dtype=np.int64), np.diff(np.concatenate((heads, [length]))))
+    starts = heads[index]
+    partial = {
+        "index": index,
+        "high": _segment_scan(minute.high, starts, np.maximum),
+        "low": _segment_scan(minute.low, starts, np.minimum),
+        "volume": _segment_scan(minute.volume, starts, np.add),
+    }
+    bars = (time[heads], minute.open[heads], partial["high"][tails], partial["low"][tails],
+            minute.close[tails], partial["volume"][tails])
+    return bars, partial
+
+
+class PartialBars(object):
+    # 一个粗频率序列在每根1m bar上正在形成的bar
+    __slots__ = ("series", "minute", "index", "high", "low", "volume")
+
+    def __init__(self, series, minute, index, high, low, volume):
+        self.series = series
+        self.minute = minute
+        self.index = index
+        self.high = high
+        self.low = low
+        self.volume = volume
+
+    def at(self, now):
+        # 截止到now尚未走完的bar：返回 (它在粗频率序列中的位置, 最后一根1m bar的位置)，没有则返回None
+        position = self.minute.completed(now) - 1
+        if position < 0:
+            return None
+        bar = int(self.index[position])
+        if self.series.close_time[bar] <= now:
+            return None
+        return bar, position
+
+    def row(self, bar, position):
+        # 正在形成的bar：time, open, high, low, close, volume
+        return (self.series.time[bar], self.series.open[bar], self.high[position], self.low[position],
+                self.minute.close[position], self.volume[position])
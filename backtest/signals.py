@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# 信号模式：适用于只根据指标最新值决定买卖的无状态策略（ROC、MOM、BOP、ADOSC、RSI等）。
+# 策略文件中定义
+#
+#     SIGNAL_ORDER_TYPE = "limit"   # 或 "market"
+#     def vectorized_signal(context, bars): ...
+#
+# vectorized_signal在整段历史上一次性计算指标，返回与bars等长的信号数组（1买入，-1卖出，0无信号），
+# 历史数据不足、逐bar模式下会等待的bar必须返回0。之后把信号变化处的下单意图交给fills.py一次撮合，
+# 净值曲线由账户流水向量化得到。
+#
+# 下单方式与策略中的写法一致：
+#     "market"：市价单，买入时用掉全部现金，卖出时卖出全部持仓
+#     "limit"： 买入 buy_limit(数量=现金/收盘价*0.98, 价格=收盘价*1.02)，
+#               卖出 sell_limit(数量=全部持仓, 价格=收盘价*0.98)
+
+import numpy as np
+
+from .engine import BacktestResult, _equity
+from .fills import Intents, apply_fills, simulate_fills
+
+ORDER_TYPES = ("market", "limit")
+
+
+def _intents(signal, first, close, order_type):
+    # 每段同方向的信号在开头下单：卖出全部持仓；市价买入用掉全部现金；
+    # limit方式买入每次用掉98%的现金，剩余现金在这一段之后的bar上继续买入，直到不够最小下单量
+    changes = np.flatnonzero(np.diff(signal) != 0) + 1
+    starts = np.concatenate(([0], changes)).astype(np.int64)
+    ends = np.concatenate((changes, [len(signal)])).astype(np.int64)
+    sides = signal[starts] if len(signal) else np.zeros(0)
+    keep = sides != 0
+    starts, ends, sides = starts[keep], ends[keep], sides[keep]
+    if order_type == "limit":
+        # 买入段展开成每根bar一个意图
+        lengths = np.where(sides > 0, ends - starts, 1)
+        sides = np.repeat(sides, lengths)
+        bars = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum()) + first
+        price = close[bars]
+        return Intents(bars, sides, np.where(sides > 0, price * 1.02, price * 0.98), np.nan,
+                       np.where(sides > 0, 0.98, 1.0))
+    return Intents(starts + first, sides)
+
+
+def run_signals(engine, strategy, params=None, user_data=None, security=None):
+    strategy, context, clock, first, last = engine._prepare(strategy, params, user_data, security)
+    namespace = strategy.namespace
+    if "vectorized_signal" not in namespace:
+        raise ValueError("策略 %s 没有定义vectorized_signal，不能使用信号模式" % strategy.name)
+    order_type = namespace.get("SIGNAL_ORDER_TYPE", "market")
+    if order_type not in ORDER_TYPES:
+        raise ValueError("不支持的SIGNAL_ORDER_TYPE: %s" % order_type)
+
+    signal = np.asarray(namespace["vectorized_signal"](context, clock))
+    if len(signal) != len(clock):
+        raise ValueError("vectorized_signal返回的信号长度与kline数量不一致")
+    signal = np.sign(np.nan_to_num(signal[first:last]))
+
+    security = context.security
+    account = context.account
+    close = clock.close
+    intents = _intents(signal, first, close, order_type)
+    fills = simulate_fills(close, intents, account.huobi_cny_cash, getattr(account, security), security,
+                           context.order._commission, context.order._slippage)
+    apply_fills(context, intents, fills)
+
+    net = _equity(context, clock, first, last)
+    if len(signal):
+        account._mark(account._track(security), close[last - 1])
+    return BacktestResult(strategy, context, clock.close_time[first:last], net, context.log.records)
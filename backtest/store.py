@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# 磁盘上的列式kline库：每个(标的, 频率)一个目录，每个字段一个.npy文件，
+# 读取时使用内存映射，多个进程/多次回测共享操作系统的页缓存，get_price取窗口只是数组切片。
+#
+#     root/huobi_cny_btc/1m/time.npy    int64，bar开始时间（秒）
+#     root/huobi_cny_btc/1m/open.npy    float64
+#     ...
+#
+# 只导入1m数据时，其余频率在第一次使用时由1m生成并写入库中（也可以用resample预先生成），
+# 同时写入部分bar数组，与1m数据等长，用于取出正在形成中的粗频率bar（见resample.py）：
+#     root/huobi_cny_btc/1d/partial/index.npy   int64，每根1m bar所在日线的位置
+#     root/huobi_cny_btc/1d/partial/high.npy    float64，当日截止到这根1m bar的最高价
+#     ...
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .constants import FIELDS, FREQUENCIES
+from .data import BarSeries, MarketData
+from .resample import PARTIAL_COLUMNS, SOURCE, PartialBars, derived_frequencies, resample
+
+COLUMNS = ("time",) + FIELDS
+DTYPES = {"time": np.int64, "index": np.int64}
+
+
+def _save(path, array):
+    # 先写临时文件再改名，避免正在映射该文件的进程读到写了一半的数据；
+    # 临时文件名带上进程号，多个进程同时生成同一个频率时互不干扰
+    temporary = "%s.%d.tmp.npy" % (path, os.getpid())
+    np.save(temporary, array)
+    os.replace(temporary, path)
+
+
+class KlineStore(MarketData):
+    def __init__(self, root, utc_offset=0):
+        # utc_offset：由1m生成粗频率时bar边界所在时区相对UTC的偏移（秒）
+        MarketData.__init__(self)
+        self.root = root
+        self.utc_offset = utc_offset
+
+    def _path(self, security, frequency, column=None):
+        path = os.path.join(self.root, security, frequency)
+        if column is None:
+            return path
+        return os.path.join(path, column + ".npy")
+
+    def write(self, security, frequency, time, open, high, low, close, volume):
+        if frequency not in FREQUENCIES:
+            raise ValueError("不支持的频率: %s" % frequency)
+        arrays = dict(zip(COLUMNS, (time, open, high, low, close, volume)))
+        length = len(time)
+        for column in COLUMNS:
+            arrays[column] = np.ascontiguousarray(arrays[column], dtype=DTYPES.get(column, np.float64))
+            if len(arrays[column]) != length:
+                raise ValueError("字段 %s 的长度与time不一致" % column)
+        if length > 1 and np.any(np.diff(arrays["time"]) <= 0):
+            raise ValueError("time必须严格递增")
+
+        # 新的1m数据使由它生成的频率过期，删除后在下次使用时重新生成；直接写入的粗频率不再是生成的
+        stale = derived_frequencies() if frequency == SOURCE else []
+        for derived in stale:
+            if self._derived(security, derived):
+                self._remove(security, derived)
+        self._remove_partial(security, frequency)
+
+        directory = self._path(security, frequency)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for column in COLUMNS:
+            _save(self._path(security, frequency, column), arrays[column])
+        self._series.pop((security, frequency), None)
+
+    def _partial_path(self, security, frequency, column=None):
+        path = os.path.join(self._path(security, frequency), "partial")
+        if column is None:
+            return path
+        return os.path.join(path, column + ".npy")
+
+    def _derived(self, security, frequency):
+        return os.path.isdir(self._partial_path(security, frequency))
+
+    def _remove(self, security, frequency):
+        shutil.rmtree(self._path(security, frequency), ignore_errors=True)
+        self._series.pop((security, frequency), None)
+        self._partials.pop((security, frequency), None)
+
+    def _remove_partial(self, security, frequency):
+        shutil.rmtree(self._partial_path(security, frequency), ignore_errors=True)
+        self._partials.pop((security, frequency), None)
+
+    def resample(self, security, frequencies=None, utc_offset=None):
+        # 由1m数据生成更粗的频率（默认全部）并写入库中，之后回测直接映射这些文件
+        if utc_offset is None:
+            utc_offset = self.utc_offset
+        minute = self.series(security, SOURCE)
+        for frequency in frequencies or derived_frequencies():
+            bars, partial = resample(minute, frequency, utc_offset)
+            self.write(security, frequency, *bars)
+            directory = self._partial_path(security, frequency)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            for column in PARTIAL_COLUMNS:
+                array = np.ascontiguousarray(partial[column], dtype=DTYPES.get(column, np.float64))
+                _save(self._partial_path(security, frequency, column), array)
+
+    def write_dataframe(self, security, frequency, df):
+        if "time" in df.columns:
+            index = pd.DatetimeIndex(df["time"])
+        else:
+            index = pd.DatetimeIndex(df.index)
+        time = index.values.astype("datetime64[s]").astype(np.int64)
+        self.write(security, frequency, time, *(df[field].values for field in FIELDS))
+
+    def add(self, security, frequency, time, open, high, low, close, volume):
+        self.write(security, frequency, time, open, high, low, close, volume)
+        return self.series(security, frequency)
+
+    def _load(self, security, frequency):
+        columns = [np.load(self._path(security, frequency, column), mmap_mode="r") for column in COLUMNS]
+        return BarSeries(security, frequency, *columns)
+
+    def _derivable(self, security, frequency):
+        return frequency in derived_frequencies() and os.path.exists(self._path(security, SOURCE, "time"))
+
+    def series(self, security, frequency):
+        key = (security, frequency)
+        series = self._series.get(key)
+        if series is None:
+            if not os.path.exists(self._path(security, frequency, "time")):
+                if not self._derivable(security, frequency):
+                    raise KeyError("没有 %s 的 %s 行情数据" % key)
+                self.resample(security, [frequency])
+            series = self._series[key] = self._load(security, frequency)
+        return series
+
+    def partial(self, security, frequency):
+        key = (security, frequency)
+        partial = self._partials.get(key)
+        if partial is None and self._derived(security, frequency):
+            columns = [np.load(self._partial_path(security, frequency, column), mmap_mode="r")
+                       for column in PARTIAL_COLUMNS]
+            partial = self._partials[key] = PartialBars(self.series(security, frequency),
+                                                        self.series(security, SOURCE), *columns)
+        return partial
+
+    def __contains__(self, key):
+        return (key in self._series or os.path.exists(self._path(key[0], key[1], "time"))
+                or self._derivable(key[0], key[1]))
+
+    def securities(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def frequencies(self, security):
+        return [frequency for frequency in FREQUENCIES if (security, frequency) in self]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# 加载策略文件：策略文件无需任何修改，按托管平台的方式执行，
+# 即注入 HUOBI_CNY_*_MIN_ORDER_* 常量后执行整个文件，取出 PARAMS、initialize 和 handle_data。
+# 可选的 handle_order(context, order) 在挂单成交时调用，见engine.py。
+
+import io
+import os
+
+from .constants import strategy_globals
+
+
+class Strategy(object):
+    __slots__ = ("path", "name", "namespace", "params", "initialize", "handle_data", "handle_order")
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.namespace = namespace
+        self.params = namespace.get("PARAMS", {})
+        self.initialize = namespace.get("initialize")
+        self.handle_data = namespace.get("handle_data")
+        self.handle_order = namespace.get("handle_order")
+        if self.initialize is None or self.handle_data is None:
+            raise ValueError("策略文件 %s 缺少 initialize 或 handle_data 函数" % path)
+
+
+_compiled = {}
+
+
+def _compile(path):
+    # 参数扫描时同一个策略文件会被加载成千上万次，编译结果按文件修改时间缓存
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    code = _compiled.get(key)
+    if code is None:
+        with io.open(path, encoding="utf-8") as f:
+            source = f.read()
+        code = _compiled[key] = compile(source, path, "exec")
+    return code
+
+
+def load_strategy(path):
+    # 每次加载都得到一个全新的命名空间，多次回测之间互不影响
+    namespace = strategy_globals()
+    namespace["__name__"] = "strategy"
+    namespace["__file__"] = path
+    exec(_compile(path), namespace)
+    return Strategy(path, namespace)
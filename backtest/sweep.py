@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# 参数扫描：对策略在initialize中设置的 context.user_data 参数做网格或随机采样，
+# 用进程池并行回测。行情数据不随任务传递：KlineStore在每个进程中以内存映射方式打开，
+# 所有进程共享操作系统的页缓存；内存中的MarketData则依赖fork让子进程直接继承父进程的数据。
+#
+#     from backtest import KlineStore, grid, sweep
+#     table = sweep("MACD指标策略.py", KlineStore("data"),
+#                   grid(short_window=[8, 12, 16], long_window=[20, 26, 40]), processes=4)
+
+import itertools
+import multiprocessing
+import random
+
+import pandas as pd
+
+from .engine import Engine
+from .store import KlineStore
+
+# 子进程中使用的数据和回测设置，由_initialize_worker设置
+_worker = {}
+
+
+def grid(**axes):
+    # grid(a=[1, 2], b=[3, 4]) -> [{"a": 1, "b": 3}, {"a": 1, "b": 4}, ...]
+    names = sorted(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*[axes[name] for name in names])]
+
+
+def random_samples(space, count, seed=None):
+    # space中的值为列表时从中随机选取；为(low, high)元组时在区间内均匀采样，两端都是整数时采样整数
+    generator = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        sample = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    sample[name] = generator.randint(low, high)
+                else:
+                    sample[name] = generator.uniform(low, high)
+            else:
+                sample[name] = generator.choice(list(values))
+        samples.append(sample)
+    return samples
+
+
+def _initialize_worker(feed, strategy, params, mode):
+    if isinstance(feed, str):
+        feed = KlineStore(feed)
+    _worker["engine"] = Engine(feed, log_level=None)
+    _worker["strategy"] = strategy
+    _worker["params"] = params
+    _worker["mode"] = mode
+
+
+def _run_one(user_data):
+    result = _worker["engine"].run(_worker["strategy"], _worker["params"], _worker["mode"], user_data)
+    summary = dict(user_data)
+    summary["total_return"] = result.total_return
+    summary["max_drawdown"] = result.max_drawdown
+    summary["orders"] = sum(1 for order in result.orders if order.status == "filled")
+    return summary
+
+
+def sweep(strategy, feed, samples, params=None, mode="bar", processes=None, chunksize=1):
+    # samples为user_data覆盖值的列表（见grid、random_samples），返回每组参数的回测结果汇总
+    if processes == 1:
+        _initialize_worker(feed, strategy, params, mode)
+        return pd.DataFrame([_run_one(sample) for sample in samples])
+
+    if isinstance(feed, KlineStore):
+        # 只把数据目录传给子进程，子进程各自映射同一批文件
+        pool_context = multiprocessing
+        initializer, initargs = _initialize_worker, (feed.root, strategy, params, mode)
+    else:
+        # 内存中的数据无法映射，在父进程中设置好后由fork出来的子进程直接继承
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("当前平台不支持fork，请把数据写入KlineStore后再做参数扫描")
+        _initialize_worker(feed, strategy, params, mode)
+        pool_context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+
+    pool = pool_context.Pool(processes, initializer, initargs)
+    try:
+        rows = pool.map(_run_one, samples, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return pd.DataFrame(rows)
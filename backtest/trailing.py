@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# 跟踪委托：卖出方向在最新价不低于触发价后开始记录最高价，价格从最高价回调 tracking_range% 时以市价单卖出；
+# 买入方向在最新价不高于触发价后记录最低价，从最低价反弹 tracking_range% 时以市价单买入，与路踪委托下单.py相同。
+# 每个标的按方向把跟踪委托放在一组numpy数组中（每个委托一行），新价格用一次向量运算
+# 更新所有委托的最高/最低价并找出回调幅度已满足的委托，只返回被触发的委托编号。
+#
+#     context.order.trailing_sell("huobi_cny_btc", 5000, 1, quantity=10)
+
+import numpy as np
+
+
+class TrailingStops(object):
+    # 一个标的一个方向的跟踪委托。rows为 委托编号 -> 行，已触发或撤销的行编号置0，过多时压缩数组；
+    # extreme为触发后的最高（卖出）/最低（买入）价，尚未达到触发价时为nan
+    __slots__ = ("side", "size", "ids", "trigger", "range", "extreme", "rows")
+
+    def __init__(self, side, capacity=16):
+        self.side = side
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.trigger = np.zeros(capacity)
+        self.range = np.zeros(capacity)
+        self.extreme = np.full(capacity, np.nan)
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, id, trigger_price, tracking_range):
+        if self.size == len(self.ids):
+            self._resize(2 * len(self.ids))
+        row = self.size
+        self.ids[row] = id
+        self.trigger[row] = trigger_price
+        self.range[row] = tracking_range
+        self.extreme[row] = np.nan
+        self.rows[id] = row
+        self.size += 1
+
+    def _resize(self, capacity):
+        size = self.size
+        for name, fill in (("ids", 0), ("trigger", 0.0), ("range", 0.0), ("extreme", np.nan)):
+            column = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=column.dtype)
+            grown[:size] = column[:size]
+            setattr(self, name, grown)
+
+    def _compact(self):
+        size = self.size
+        keep = np.flatnonzero(self.ids[:size] > 0)
+        for name in ("ids", "trigger", "range", "extreme"):
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self.size = len(keep)
+        self.rows = dict(zip(self.ids[:self.size].tolist(), range(self.size)))
+
+    def _drop(self, rows):
+        ids = self.ids[rows].tolist()
+        self.ids[rows] = 0
+        for id in ids:
+            del self.rows[id]
+        if self.size > 2 * len(self.rows) + 64:
+            self._compact()
+        return ids
+
+    def cancel(self, id):
+        row = self.rows.get(id)
+        if row is None:
+            return False
+        self._drop([row])
+        return True
+
+    def extreme_of(self, id):
+        # 委托触发后记录的最高/最低价，尚未达到触发价时为None
+        row = self.rows.get(id)
+        if row is None or np.isnan(self.extreme[row]):
+            return None
+        return float(self.extreme[row])
+
+    def update(self, price):
+        # 用最新价更新所有委托，返回回调幅度已满足的委托编号（按编号排序）并把它们移出
+        size = self.size
+        if not size:
+            return []
+        extreme = self.extreme[:size]
+        armed = ~np.isnan(extreme)
+        if self.side == "sell":
+            armed |= price >= self.trigger[:size]
+            np.fmax(extreme, price, out=extreme, where=armed)
+            current = (1 - price / extreme) * 100
+        else:
+            armed |= price <= self.trigger[:size]
+            np.fmin(extreme, price, out=extreme, where=armed)
+            current = (price / extreme - 1) * 100
+        fired = np.flatnonzero((current >= self.range[:size]) & (self.ids[:size] > 0))
+        if not len(fired):
+            return []
+        return sorted(self._drop(fired))
+
+
+class TrailingBook(object):
+    # 一个标的的跟踪委托，买入和卖出各一组
+    __slots__ = ("buy", "sell")
+
+    def __init__(self):
+        self.buy = TrailingStops("buy")
+        self.sell = TrailingStops("sell")
+
+    def __len__(self):
+        return len(self.buy) + len(self.sell)
+
+    def update(self, price):
+        return sorted(self.buy.update(price) + self.sell.update(price))
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# 触发单：计划委托（最新价突破/跌破触发价后下单）和止盈止损委托（两个触发价先到先下单，另一个随之撤销），
+# 触发后按计划委托下单.py、止盈止损委托下单.py中的方式下达限价单或市价单。
+# 每个标的按触发方向各保存一个按触发价排序的列表，新价格用二分查找找到它越过的触发价，
+# 会触发的总是列表末尾的一段，所以每个价格只访问被触发的触发单，O(log n + k)，触发单再多也不需要逐个比较。
+# 撤销只做标记，已撤销的触发单在被越过时丢弃，过多时重建列表。
+#
+#     context.order.plan_sell("huobi_cny_btc", 4500, price=4450, quantity=10)
+#     context.order.take_profit_stop_loss("huobi_cny_btc", "sell", 5000, 4900, 3000, 2900, quantity=10)
+
+import bisect
+
+from .constants import CASH_UNIT, to_units
+
+# 触发方向：RISING在最新价不低于触发价时触发，FALLING在最新价不高于触发价时触发
+RISING = "rising"
+FALLING = "falling"
+
+# 触发单类型，Order._new_trigger据此检查
+KINDS = ("plan", "take_profit", "stop_loss", "trailing")
+
+
+class Trigger(object):
+    __slots__ = ("id", "time", "security", "kind", "direction", "trigger_price", "side", "type", "price",
+                 "quantity", "cash_amount", "group", "tracking_range", "triggered_time", "order_id", "status")
+
+    def __init__(self, id, time, security, kind, direction, trigger_price, side, type, price=None,
+                 quantity=None, cash_amount=None, group=None, tracking_range=None):
+        # type为"limit"时按price（元）下单，数量为quantity，或者（止盈止损买入）用cash_amount/price算出；
+        # type为"market"时买入cash_amount元、卖出quantity个。group是同一个止盈止损委托中另一个触发单的编号，
+        # tracking_range是跟踪委托的回调幅度（%），跟踪委托由trailing.py管理
+        self.id = id
+        self.time = time
+        self.security = security
+        self.kind = kind
+        self.direction = direction
+        self.trigger_price = trigger_price
+        self.side = side
+        self.type = type
+        self.price = price
+        self.quantity = quantity
+        self.cash_amount = cash_amount
+        self.group = group
+        self.tracking_range = tracking_range
+        self.triggered_time = None
+        self.order_id = None
+        self.status = "open"
+
+    def __repr__(self):
+        return "Trigger(%s %s %s %s %s %s)" % (self.id, self.kind, self.side, self.security, self.trigger_price,
+                                               self.status)
+
+
+class _Ladder(object):
+    # 一个方向的触发单，keys升序，与ids一一对应；被触发的是keys >= key的末尾一段
+    __slots__ = ("keys", "ids")
+
+    def __init__(self):
+        self.keys = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def insert(self, key, id):
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, id)
+
+    def take(self, key):
+        position = bisect.bisect_left(self.keys, key)
+        ids = self.ids[position:]
+        del self.keys[position:]
+        del self.ids[position:]
+        return ids
+
+    def keep(self, live):
+        pairs = [(key, id) for key, id in zip(self.keys, self.ids) if id in live]
+        self.keys = [key for key, id in pairs]
+        self.ids = [id for key, id in pairs]
+
+
+class TriggerBook(object):
+    # 一个标的的触发单。RISING的触发价取负数保存，两个方向被触发的都是列表末尾
+    __slots__ = ("_rising", "_falling", "live")
+
+    def __init__(self):
+        self._rising = _Ladder()
+        self._falling = _Ladder()
+        self.live = {}
+
+    def __len__(self):
+        return len(self.live)
+
+    def add(self, trigger):
+        units = to_units(trigger.trigger_price, CASH_UNIT)
+        if trigger.direction == RISING:
+            self._rising.insert(-units, trigger.id)
+        else:
+            self._falling.insert(units, trigger.id)
+        self.live[trigger.id] = trigger
+
+    def cancel(self, id):
+        # 返回被撤销的触发单，不在簿中时返回None
+        trigger = self.live.pop(id, None)
+        if len(self._rising) + len(self._falling) > 2 * len(self.live) + 64:
+            self._rising.keep(self.live)
+            self._falling.keep(self.live)
+        return trigger
+
+    def cross(self, price):
+        # 最新价price（元）触发的触发单，按编号排序并从簿中删除
+        units = to_units(price, CASH_UNIT)
+        live = self.live
+        ids = [id for id in self._rising.take(-units) + self._falling.take(units) if id in live]
+        ids.sort()
+        return [live.pop(id) for id in ids]
+
+    def triggers(self):
+        return [self.live[id] for id in sorted(self.live)]
@@ -76,6 +76,7 @@ def handle_data(context):
             # 以市价单卖出所有持仓
             context.log.info("stop loss selling huobi_cny_btc")
             context.order.sell(context.security, quantity=str(context.account.huobi_cny_btc))
+        context.finished = True
         return
 
     # 获取历史数据,取后sma_window_size根bar
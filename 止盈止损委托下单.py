@@ -85,8 +85,11 @@ def handle_data(context):
             entrust_price = context.user_data.stop_loss_entrust_price
         else:
             context.log.info("未触发止盈/止损信号，进入下一根bar")
+            context.wake_below = context.user_data.take_profit_trigger_price
+            context.wake_above = context.user_data.stop_loss_trigger_price
             return
         context.user_data.triggered_already = True
+        context.finished = True
         # 执行限价单买入，以止盈/止损
         if context.account.huobi_cny_cash >= context.user_data.buy_entrust_cash_amount:
             # 计算买入数量
@@ -113,8 +116,11 @@ def handle_data(context):
             entrust_price = context.user_data.stop_loss_entrust_price
         else:
             context.log.info("未触发止盈/止损信号，进入下一根bar")
+            context.wake_above = context.user_data.take_profit_trigger_price
+            context.wake_below = context.user_data.stop_loss_trigger_price
             return
         context.user_data.triggered_already = True
+        context.finished = True
         # 执行限价单卖出，以止盈/止损
         if context.account.huobi_cny_btc >= context.user_data.sell_entrust_quantity:
             context.log.info("正在卖出 %s" % context.security)
@@ -15,6 +15,9 @@
 # 3)并且动态进行止盈和止损。
 
 
+from collections import deque
+import math
+
 import numpy as np
 
 # 阅读1，首次阅读可跳过:
@@ -63,8 +66,9 @@ def handle_data(context):
     # 获取当前行情数据
     price = context.data.get_current_price(context.security)
 
-    # 1 计算ATR
-    atr = calc_atr(hist.iloc[:len(hist)-1])
+    # 1 计算ATR（同时更新唐奇安通道）
+    cache = update_cache(context, hist.iloc[:len(hist)-1], context.user_data.T)
+    atr = cache["atr"]
 
     # 2 判断加仓或止损
     if context.user_data.hold_flag is True and context.account.huobi_cny_btc > 0:  # 先判断是否持仓
@@ -93,7 +97,7 @@ def handle_data(context):
             context.order.sell(context.security, quantity=str(context.account.huobi_cny_btc))
     # 3 判断入场离场
     else:
-        out = in_or_out(context, hist.iloc[:len(hist) - 1], price, context.user_data.T)
+        out = in_or_out(context, cache, price)
         if out == 1:  # 入场
             if context.user_data.hold_flag is False:
                 value = context.account.huobi_cny_net * 0.01
@@ -137,12 +141,12 @@ def init_local_context(context):
     context.user_data.add_time = 0
 
 
-# 用户自定义的函数，可以被handle_data调用: 唐奇安通道计算及判断入场离场
-# data是日线级别的历史数据，price是当前分钟线数据（用来获取当前行情），T代表需要多少根日线
-def in_or_out(context, data, price, T):
-    up = np.max(data["high"].iloc[-T:])
+# 用户自定义的函数，可以被handle_data调用: 唐奇安通道判断入场离场
+# cache是update_cache维护的日线级别缓存，price是当前分钟线数据（用来获取当前行情）
+def in_or_out(context, cache, price):
+    up = cache["up"]
     # 这里是T/2唐奇安下沿，在向下突破T/2唐奇安下沿卖出而不是在向下突破T唐奇安下沿卖出，这是为了及时止损
-    down = np.min(data["low"].iloc[-int(T / 2):])
+    down = cache["down"]
     context.log.info("当前价格为: %s, 唐奇安上轨为: %s, 唐奇安下轨为: %s" % (price, up, down))
     # 当前价格升破唐奇安上沿，产生入场信号
     if price > up:
@@ -158,14 +162,80 @@ def in_or_out(context, data, price, T):
 
 
 # 用户自定义的函数，可以被handle_data调用：ATR值计算
-def calc_atr(data):  # data是日线级别的历史数据
-    tr_list = []
-    for i in range(len(data)):
-        tr = max(data["high"].iloc[i] - data["low"].iloc[i], data["high"].iloc[i] - data["close"].iloc[i - 1],
-                 data["close"].iloc[i - 1] - data["low"].iloc[i])
-        tr_list.append(tr)
-    atr = np.array(tr_list).mean()
-    return atr
+# data是日线级别的历史数据，第一根bar之前的收盘价不在data中，所以第一根bar的真实波幅只取最高价-最低价
+def calc_atr(data):
+    high = np.array(data["high"])
+    low = np.array(data["low"])
+    close = np.array(data["close"])
+    tr = high - low
+    tr[1:] = np.maximum(tr[1:], np.maximum(high[1:] - close[:-1], close[:-1] - low[1:]))
+    return tr.mean()
+
+
+# 用户自定义的函数，可以被handle_data调用：维护ATR和唐奇安通道的缓存
+# data是最近T根已经走完的日线。每来一根新bar只计算这根bar的真实波幅，ATR用真实波幅的滚动和得到，
+# 唐奇安上下沿用单调队列维护，所以每根bar的计算量与T无关；数据不连续或T变化时用calc_atr重建缓存
+def update_cache(context, data, T):
+    cache = getattr(context.user_data, "turtle_cache", None)
+    last_time = data.index[-1]
+    if cache is not None and cache["T"] == T and cache["time"] == last_time:
+        return cache
+    if cache is None or cache["T"] != T or T < 2 or cache["time"] != data.index[-2]:
+        cache = build_cache(data, T)
+        context.user_data.turtle_cache = cache
+        return cache
+
+    high = data["high"].iloc[-1]
+    low = data["low"].iloc[-1]
+    close = data["close"].iloc[-1]
+    # 第二根bar在窗口中成为第一根，它的真实波幅移出滚动和，由最高价-最低价代替
+    tr = max(high - low, high - cache["close"], cache["close"] - low)
+    trs = cache["trs"]
+    if len(trs) == trs.maxlen:
+        cache["tr_sum"] -= trs[0]
+    trs.append(tr)
+    cache["tr_sum"] += tr
+    cache["count"] += 1
+    # 每T根bar重新求和一次，避免滚动和的浮点误差累积
+    if cache["count"] % T == 0:
+        cache["tr_sum"] = math.fsum(trs)
+    cache["atr"] = (cache["tr_sum"] + data["high"].iloc[0] - data["low"].iloc[0]) / T
+
+    push_extreme(cache["highs"], cache["count"], high, T, 1)
+    push_extreme(cache["lows"], cache["count"], low, max(int(T / 2), 1), -1)
+    cache["up"] = cache["highs"][0][1]
+    cache["down"] = cache["lows"][0][1]
+    cache["time"] = last_time
+    cache["close"] = close
+    return cache
+
+
+# 用户自定义的函数，可以被update_cache调用：用最近T根日线重建缓存
+def build_cache(data, T):
+    high = np.array(data["high"])[-T:]
+    low = np.array(data["low"])[-T:]
+    close = np.array(data["close"])[-T:]
+    cache = {"T": T, "time": data.index[-1], "close": close[-1], "count": len(high) - 1,
+             "trs": deque(maxlen=max(T - 1, 1)), "highs": deque(), "lows": deque()}
+    for i in range(1, len(high)):
+        cache["trs"].append(max(high[i] - low[i], high[i] - close[i - 1], close[i - 1] - low[i]))
+    for i in range(len(high)):
+        push_extreme(cache["highs"], i, high[i], T, 1)
+        push_extreme(cache["lows"], i, low[i], max(int(T / 2), 1), -1)
+    cache["tr_sum"] = math.fsum(cache["trs"])
+    cache["atr"] = calc_atr(data.iloc[-T:])
+    cache["up"] = cache["highs"][0][1]
+    cache["down"] = cache["lows"][0][1]
+    return cache
+
+
+# 用户自定义的函数，可以被update_cache调用：单调队列，队首是最近window根bar的最大值(sign=1)或最小值(sign=-1)
+def push_extreme(queue, i, value, window, sign):
+    while queue and sign * queue[-1][1] <= sign * value:
+        queue.pop()
+    queue.append((i, value))
+    while queue[0][0] <= i - window:
+        queue.popleft()
 
 
 # 用户自定义的函数，可以被handle_data调用
@@ -82,6 +82,7 @@ def handle_data(context):
             if current_price >= context.user_data.buy_trigger_price:
                 # 当前价格超过了买入的触发价格，将下达买入委托
                 context.user_data.buy_signal_triggered = True
+                context.finished = True
                 context.log.info("当前价格突破了触发价格, 产生了计划委托买入信号")
                 # 限价单买入
                 if context.user_data.entrust_type == "limit":
@@ -98,6 +99,7 @@ def handle_data(context):
                     context.log.error("请改正后重新运行程序")
             else:
                 context.log.info("尚未触发买入信号，进入下一个bar")
+                context.wake_above = context.user_data.buy_trigger_price
         else:
             context.log.info("已经完成买入计划委托订单")
     # 卖出计划委托
@@ -107,6 +109,7 @@ def handle_data(context):
             if current_price <= context.user_data.sell_trigger_price:
                 # 当前价格跌破了卖出的触发价格，将下达卖出委托
                 context.user_data.sell_signal_triggered = True
+                context.finished = True
                 context.log.info("当前价格跌破了触发价格, 产生了计划委托卖出信号")
                 # 限价单卖出
                 if context.user_data.entrust_type == "limit":
@@ -122,6 +125,7 @@ def handle_data(context):
                     context.log.error("请改正后重新运行程序")
             else:
                 context.log.info("尚未触发卖出信号，进入下一个bar")
+                context.wake_below = context.user_data.sell_trigger_price
         else:
             context.log.info("已经完成卖出计划委托订单")
     # 买卖方向参数设置错误
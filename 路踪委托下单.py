@@ -89,6 +89,7 @@ def handle_data(context):
             # 当前回调幅度大于等于设置的幅度，则发出委托
             if current_range >= context.user_data.tracking_range:
                 context.user_data.order_completed_flag = True
+                context.finished = True
                 context.log.info("回调幅度已经满足条件，发出市价单买入委托信号")
                 # 账户金钱足够，则执行市价单买入委托
                 if context.account.huobi_cny_cash >= context.user_data.buy_entrust_cash_amount:
@@ -121,6 +122,7 @@ def handle_data(context):
             # 当前回调幅度大于等于设置的幅度
             if current_range >= context.user_data.tracking_range:
                 context.user_data.order_completed_flag = True
+                context.finished = True
                 context.log.info("回调幅度已经满足条件，发出市价单卖出委托信号")
                 # 账户持仓足够，则执行市价单卖出委托
                 if context.account.huobi_cny_btc >= context.user_data.sell_entrust_quantity: